@@ -0,0 +1,168 @@
+"""리밸런싱 규칙에 따른 포트폴리오 백테스트 엔진입니다.
+
+리밸런싱 사이에는 보유 수량이 그대로이므로 자산별 가치는 누적 수익률에 비례해 움직입니다. 그래서 구간마다 "목표 비중 x 구간 시작
+대비 누적 수익률"만 구하면 날짜별 반복 없이 보유 비중의 이탈, 포트폴리오 가치, 리밸런싱 시점의 회전율과 거래 비용을 모두 배열
+연산으로 계산할 수 있습니다. 반복은 리밸런싱 시점 수만큼만 일어나며(비중 이탈 규칙의 다음 시점 찾기), 날짜 수와는 무관합니다.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from metrics import TRADING_DAYS, cross_sectional_metrics
+
+CASH = "Cash"
+# 달력 리밸런싱 주기: 이름 -> pandas 기간 빈도
+FREQUENCIES = {"weekly": "W", "monthly": "M", "quarterly": "Q", "annual": "Y"}
+
+_worker_returns = None
+
+
+def calendar_positions(index, frequency):
+    """각 기간의 마지막 거래일 위치를 반환합니다. 마지막 기간은 백테스트 끝이므로 제외합니다."""
+    periods = index.to_period(FREQUENCIES.get(frequency, frequency))
+    return np.flatnonzero(periods[1:] != periods[:-1])
+
+
+def _drift(growth, weights):
+    """구간 시작 대비 누적 수익률 growth (날짜 x 자산)에서 보유 비중의 이탈을 계산합니다."""
+    held = growth * weights
+    return held / held.sum(axis=1, keepdims=True)
+
+
+def _threshold_positions(cumulative, weights, threshold):
+    """어떤 자산의 비중이라도 목표에서 threshold 넘게 벗어나는 첫날마다 리밸런싱하는 위치를 찾습니다."""
+    positions = []
+    start = 0
+    num_days = len(cumulative) - 1
+    while start < num_days:
+        drift = _drift(cumulative[start + 1:] / cumulative[start], weights)
+        breach = np.flatnonzero(np.abs(drift - weights).max(axis=1) > threshold)
+        # 마지막 날의 이탈은 백테스트가 끝나므로 리밸런싱하지 않습니다.
+        if len(breach) == 0 or start + breach[0] >= num_days - 1:
+            break
+        positions.append(start + breach[0])
+        start += breach[0] + 1
+    return np.array(positions, dtype=int)
+
+
+def _schedule_targets(index, columns, target_weights, weights):
+    """목표 비중 일정(날짜 x 자산)을 각 날짜 이전의 마지막 거래일 리밸런싱으로 바꿉니다."""
+    target_weights = target_weights.reindex(columns=columns, fill_value=0.0).sort_index()
+    positions = index.searchsorted(target_weights.index, side="right") - 1
+    keep = (positions >= 0) & (positions < len(index) - 1)
+    positions, targets = positions[keep], target_weights.to_numpy()[keep]
+    # 같은 거래일에 여러 일정이 겹치면 마지막 일정을 씁니다.
+    last = np.r_[positions[1:] != positions[:-1], True]
+    return positions[last], np.vstack([weights, targets[last]])
+
+
+def backtest(returns, weights, frequency=None, threshold=None, target_weights=None, cost=0.0, cash_weight=0.0,
+             cash_rate=0.0):
+    """고정 비중 포트폴리오를 리밸런싱 규칙에 따라 시뮬레이션합니다.
+
+    returns는 (날짜 x 자산) 일간 수익률, weights는 자산 순서의 목표 비중입니다. 리밸런싱 규칙은 셋 중 하나입니다.
+    frequency: "daily" 또는 FREQUENCIES의 달력 주기. 기간의 마지막 거래일 종가에 목표 비중으로 되돌립니다.
+    threshold: 어떤 자산의 비중이라도 목표에서 이만큼(비중 단위) 벗어나면 그날 종가에 되돌립니다.
+    target_weights: (날짜 x 자산) 목표 비중 일정. 날짜마다 그 이전 마지막 거래일에 새 목표로 바꿉니다 (예: 최적화 결과).
+    모두 None이면 처음 비중으로 산 뒤 리밸런싱하지 않습니다. cost는 거래 금액 대비 비용(예: 10bp = 0.001),
+    cash_weight와 cash_rate는 현금 비중과 연 이자율이며 현금도 리밸런싱 대상입니다.
+
+    반환값은 'Value'(가치 Series, 시작 1), 'Weights'(날짜별 보유 비중), 'Rebalances'(리밸런싱 날짜), 'Turnover'(연 평균 편도
+    회전율), 'Cost'(누적 비용 비율)과 연 수익률, 변동성, 샤프 비율, 최대 낙폭을 담은 딕셔너리입니다.
+    """
+    returns = returns.fillna(0)
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum() * (1 - cash_weight)
+    columns = list(returns.columns)
+    if cash_weight > 0:
+        daily_cash = (1 + cash_rate) ** (1 / TRADING_DAYS) - 1
+        returns = returns.assign(**{CASH: daily_cash})
+        weights = np.append(weights, cash_weight)
+        columns.append(CASH)
+        if target_weights is not None:
+            target_weights = target_weights.div(target_weights.sum(axis=1), axis=0) * (1 - cash_weight)
+            target_weights = target_weights.assign(**{CASH: cash_weight})
+
+    index = returns.index
+    values = returns.to_numpy()
+    num_days = len(values)
+    # cumulative[t]는 t일 시작 시점(= t-1일 종가)까지의 누적 수익률이며 cumulative[0] = 1입니다.
+    cumulative = np.vstack([np.ones(values.shape[1]), np.cumprod(1 + values, axis=0)])
+
+    targets = weights[None, :]
+    if target_weights is not None:
+        positions, targets = _schedule_targets(index, columns, target_weights, weights)
+    elif threshold is not None:
+        positions = _threshold_positions(cumulative, weights, threshold)
+    elif frequency == "daily":
+        positions = np.arange(num_days - 1)
+    elif frequency is not None:
+        positions = calendar_positions(index, frequency)
+    else:
+        positions = np.array([], dtype=int)
+    if len(targets) == 1:
+        targets = np.repeat(targets, len(positions) + 1, axis=0)
+
+    # 구간 k는 cumulative 기준 starts[k]에서 시작해 ends[k]에서 끝나며, 날마다 자기가 속한 구간 번호를 가집니다.
+    starts = np.r_[0, positions + 1]
+    ends = np.r_[positions + 1, num_days]
+    segment = np.repeat(np.arange(len(starts)), ends - starts)
+    growth = cumulative[1:] / cumulative[starts[segment]]
+
+    held = targets[segment] * growth
+    segment_end = held[ends - 1]
+    # 리밸런싱 직전 보유 비중(이전 구간 끝의 이탈 비중)과 새 목표의 차이만큼 거래합니다.
+    drifted = segment_end[:-1] / segment_end[:-1].sum(axis=1, keepdims=True)
+    traded = np.r_[0.0, np.abs(targets[1:] - drifted).sum(axis=1)]
+    cost_factor = 1 - cost * traded
+    # 구간 시작 가치 = 이전 구간들의 (성장률 x 비용 차감) 누적곱
+    segment_growth = segment_end.sum(axis=1)
+    start_value = np.cumprod(np.r_[1.0, segment_growth[:-1]] * cost_factor)
+
+    value = start_value[segment] * held.sum(axis=1)
+    daily_returns = np.r_[value[0], value[1:] / value[:-1]] - 1
+    metrics = cross_sectional_metrics(daily_returns, risk_free_rate=0)
+    years = num_days / TRADING_DAYS
+    return {
+        'Value': pd.Series(value, index=index),
+        'Weights': pd.DataFrame(held / held.sum(axis=1, keepdims=True), index=index, columns=columns),
+        'Rebalances': index[positions],
+        'Turnover': traded.sum() / 2 / years if years else np.nan,
+        'Cost': 1 - cost_factor.prod(),
+        'Annual Return': metrics['Annual Return'][0],
+        'Volatility': metrics['Volatility'][0],
+        'Sharpe Ratio': metrics['Sharpe Ratio'][0],
+        'Max Drawdown': metrics['Max Drawdown'][0],
+    }
+
+
+def _init_worker(returns):
+    global _worker_returns
+    _worker_returns = returns
+
+
+def _run_in_worker(weights, params):
+    return backtest(_worker_returns, weights, **params)
+
+
+def sweep(returns, weights, param_grid, workers=1):
+    """여러 백테스트 설정을 실행해 설정별 결과 딕셔너리 목록을 반환합니다.
+
+    param_grid는 backtest의 키워드 인자 딕셔너리 목록입니다. workers가 1보다 크거나 None(CPU 수)이면 수익률을 작업 프로세스마다
+    한 번만 넘기고 설정들을 프로세스 풀에서 나누어 실행합니다.
+    """
+    param_grid = list(param_grid)
+    workers = min(workers or os.cpu_count() or 1, len(param_grid))
+    if workers <= 1:
+        return [backtest(returns, weights, **params) for params in param_grid]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(returns,)) as pool:
+        return list(pool.map(_run_in_worker, [weights] * len(param_grid), param_grid,
+                             chunksize=max(1, len(param_grid) // (4 * workers))))
+
+
+def summarize(results, labels):
+    """sweep 결과를 설정별 요약 지표 DataFrame으로 정리합니다."""
+    keys = ['Annual Return', 'Volatility', 'Sharpe Ratio', 'Max Drawdown', 'Turnover', 'Cost']
+    summary = pd.DataFrame([{key: result[key] for key in keys} for result in results], index=labels)
+    summary['Rebalances'] = [len(result['Rebalances']) for result in results]
+    return summary
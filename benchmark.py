@@ -0,0 +1,306 @@
+"""분석 함수들이 티커 수, 기간, 몬테카를로 표본 수에 따라 어떻게 늘어나는지 재는 벤치마크입니다.
+
+데이터는 합성 제공자(SyntheticProvider)에서 만들어 임시 가격 저장소에 미리 채우므로 네트워크 지연 없이 계산 시간만 잽니다.
+결과는 커밋별 JSON으로 저장하고, 두 결과를 비교해 느려진 항목을 찾습니다.
+
+    python benchmark.py run --quick
+    python benchmark.py run --only value_at_risk --tickers 50 --years 10 --samples 1000000
+    python benchmark.py run --tickers 1 100 1000 5000 --years 1 10 30 --samples 10000 100000
+    python benchmark.py compare benchmark_results/abc1234.json benchmark_results/def5678.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import tempfile
+import itertools
+import statistics
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+import data_loader
+import disk_cache
+import price_store
+from providers import SyntheticProvider, set_provider
+from factor_model import FACTOR_TICKERS
+
+END_DATE = pd.Timestamp("2025-01-01")
+BENCHMARK_TICKER = "^GSPC"
+RESULTS_DIR = "benchmark_results"
+# SLSQP 최적화는 자산 수에 따라 급격히 느려지므로 이보다 큰 유니버스는 optimize_portfolio를 건너뜁니다.
+OPTIMIZE_MAX_TICKERS = 500
+REGRESSION_THRESHOLD = 1.2
+
+FULL_GRID = {"tickers": [1, 10, 100, 1000, 5000], "years": [1, 5, 10, 30], "samples": [1000, 10000, 100000]}
+QUICK_GRID = {"tickers": [1, 10, 100], "years": [1, 5], "samples": [1000, 10000]}
+
+BENCHMARKS = {}
+
+
+def benchmark(name, axes):
+    """벤치마크를 등록하는 데코레이터입니다.
+
+    등록되는 함수는 (티커 목록, 시작일, 종료일, 표본 수)를 받아 준비 작업을 한 뒤 시간을 잴 인자 없는 함수를 반환하며,
+    axes는 이 벤치마크가 변하는 축("tickers", "years", "samples")입니다. 건너뛸 조합이면 None을 반환합니다.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, axes)
+        return setup
+    return register
+
+
+def _tickers(count):
+    return [f"SYN{i:04d}" for i in range(count)]
+
+
+def _portfolio(tickers, start, end):
+    from portfolio_analysis import analyze_portfolio, load_portfolio_returns
+    portfolio_df = pd.DataFrame({"ETF": tickers, "Weight": 1 / len(tickers)})
+    return analyze_portfolio(portfolio_df, returns=load_portfolio_returns(tickers, start, end))
+
+
+@benchmark("analyze_risk_and_benchmark", ("years",))
+def _risk_and_benchmark(tickers, start, end, samples):
+    from etf_analysis import analyze_risk_and_benchmark
+    etf_data = price_store.get_prices(tickers[0], start, end)
+    benchmark_data = price_store.get_prices(BENCHMARK_TICKER, start, end)
+    return lambda: analyze_risk_and_benchmark(etf_data, benchmark_data, tickers[0], BENCHMARK_TICKER)
+
+
+@benchmark("analyze_factor_exposure", ("years",))
+def _factor_exposure(tickers, start, end, samples):
+    from etf_analysis import analyze_factor_exposure
+    return lambda: analyze_factor_exposure(tickers[0], start, end)
+
+
+@benchmark("compare_etfs", ("tickers", "years"))
+def _compare_etfs(tickers, start, end, samples):
+    from etf_analysis import compare_etfs
+    return lambda: compare_etfs(tickers, start, end)
+
+
+@benchmark("calculate_portfolio_performance", ("tickers", "years"))
+def _portfolio_performance(tickers, start, end, samples):
+    from portfolio_analysis import calculate_portfolio_performance
+    portfolio_data = _portfolio(tickers, start, end)
+    return lambda: calculate_portfolio_performance(portfolio_data)
+
+
+@benchmark("analyze_risk", ("tickers", "years"))
+def _portfolio_risk(tickers, start, end, samples):
+    from portfolio_analysis import analyze_risk
+    portfolio_data = _portfolio(tickers, start, end)
+    return lambda: analyze_risk(portfolio_data)
+
+
+@benchmark("macro_correlation", ("tickers", "years"))
+def _macro_correlation(tickers, start, end, samples):
+    from correlation import correlate, correlation_matrix, top_correlated, clustered
+    returns = data_loader.load_returns(tickers + [BENCHMARK_TICKER], start, end)
+    target, candidates = returns[BENCHMARK_TICKER], returns[tickers]
+
+    def run():
+        selected = top_correlated(correlate(target, candidates))
+        return clustered(correlation_matrix(candidates[selected.index]))
+    return run
+
+
+@benchmark("optimize_portfolio", ("tickers", "years", "samples"))
+def _optimize(tickers, start, end, samples):
+    from portfolio_analysis import optimize_portfolio
+    if len(tickers) < 2 or len(tickers) > OPTIMIZE_MAX_TICKERS:
+        return None
+    portfolio_data = _portfolio(tickers, start, end)
+    return lambda: optimize_portfolio(portfolio_data, num_portfolios=samples)
+
+
+@benchmark("covariance_update", ("tickers", "years"))
+def _covariance_update(tickers, start, end, samples):
+    import copy
+    from covariance import CovarianceEstimator, COVARIANCE_METHODS
+    from portfolio_analysis import load_portfolio_returns
+    returns = load_portfolio_returns(tickers, start, end)
+    # 마지막 한 달 전까지 반영된 추정기에 하루씩 새 날짜를 더하며 세 방법의 공분산을 다시 계산합니다.
+    base = CovarianceEstimator(returns.columns).update(returns.iloc[:-21])
+
+    def run():
+        estimator = copy.deepcopy(base)
+        for day in range(len(returns) - 21, len(returns)):
+            estimator.update(returns.iloc[day:day + 1])
+            for method in COVARIANCE_METHODS:
+                estimator.covariance(method)
+    return run
+
+
+@benchmark("value_at_risk", ("tickers", "years", "samples"))
+def _value_at_risk(tickers, start, end, samples):
+    from portfolio_analysis import analyze_var
+    portfolio_data = _portfolio(tickers, start, end)
+    return lambda: analyze_var(portfolio_data, num_scenarios=samples)
+
+
+@benchmark("backtest_sweep", ("tickers", "years"))
+def _backtest_sweep(tickers, start, end, samples):
+    from backtest import sweep
+    from portfolio_analysis import load_portfolio_returns
+    returns = load_portfolio_returns(tickers, start, end)
+    grid = ([{"frequency": frequency, "cost": cost} for frequency in ("daily", "monthly", "quarterly", "annual")
+             for cost in np.linspace(0, 0.005, 10)]
+            + [{"threshold": threshold, "cost": cost} for threshold in np.linspace(0.01, 0.1, 6) for cost in np.linspace(0, 0.005, 10)])
+    return lambda: sweep(returns, np.full(len(tickers), 1 / len(tickers)), grid)
+
+
+@benchmark("walk_forward", ("tickers", "years"))
+def _walk_forward(tickers, start, end, samples):
+    from walk_forward import walk_forward, TRAIN_PERIODS
+    from portfolio_analysis import load_portfolio_returns
+    if len(tickers) < 2 or len(tickers) > OPTIMIZE_MAX_TICKERS or (end - start).days < (TRAIN_PERIODS + 1) * 31:
+        return None
+    returns = load_portfolio_returns(tickers, start, end)
+    return lambda: walk_forward(returns, workers=None)
+
+
+def measure(func, repeat):
+    """한 번 미리 실행한 뒤 repeat번의 실행 시간과, 별도 실행 한 번의 tracemalloc 최대 메모리를 잽니다."""
+    func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    # 메모리 추적은 실행을 느리게 하므로 시간 측정과 따로 한 번 더 실행합니다.
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "peak_mb": peak / 2 ** 20}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _cases(names, grid):
+    for name in names:
+        _, axes = BENCHMARKS[name]
+        values = [grid[axis] if axis in axes else [None] for axis in ("tickers", "years", "samples")]
+        for tickers, years, samples in itertools.product(*values):
+            yield name, tickers, years, samples
+
+
+def run(names, grid, repeat=3, seed=0, store_dir=None):
+    """벤치마크를 실행하고 결과 딕셔너리를 반환합니다."""
+    # 합성 데이터는 실제 저장소와 캐시를 건드리지 않도록 임시 디렉터리에 둡니다.
+    store_dir = store_dir or tempfile.mkdtemp(prefix="etf_benchmark_")
+    price_store.STORE_DIR = os.path.join(store_dir, "prices")
+    disk_cache.CACHE_DIR = os.path.join(store_dir, "cache")
+    set_provider(SyntheticProvider(seed=seed))
+    # 반복 실행이 수익률 캐시에서 밀려나 저장소를 다시 읽지 않도록 가장 큰 유니버스가 들어갈 만큼 키웁니다.
+    data_loader.RETURNS_CACHE_SIZE = max(data_loader.RETURNS_CACHE_SIZE, 2 * (max(grid["tickers"]) + len(FACTOR_TICKERS) + 1))
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    start = END_DATE - pd.DateOffset(years=max(grid["years"]))
+    started = time.perf_counter()
+    price_store.get_prices_batch(_tickers(max(grid["tickers"])) + [BENCHMARK_TICKER] + list(FACTOR_TICKERS.values()),
+                                 start, END_DATE)
+    print(f"합성 데이터 준비: {time.perf_counter() - started:.1f}초", file=sys.stderr)
+
+    results = []
+    for name, num_tickers, years, samples in _cases(names, grid):
+        setup, _ = BENCHMARKS[name]
+        start = END_DATE - pd.DateOffset(years=years or max(grid["years"]))
+        func = setup(_tickers(num_tickers or 1), start, END_DATE, samples)
+        if func is None:
+            continue
+        case = {"benchmark": name, "tickers": num_tickers, "years": years, "samples": samples}
+        case.update(measure(func, repeat))
+        results.append(case)
+        print(f"{name:32s} tickers={num_tickers!s:>5s} years={years!s:>4s} samples={samples!s:>7s} "
+              f"{case['seconds'] * 1000:10.1f} ms {case['peak_mb']:9.1f} MB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, candidate, threshold=REGRESSION_THRESHOLD):
+    """두 결과에서 같은 조건의 항목을 짝지어 시간과 메모리 비율을 담은 DataFrame을 반환합니다."""
+    key = ["benchmark", "tickers", "years", "samples"]
+
+    def frame(report):
+        # 벤치마크가 변하지 않는 축은 None으로 저장되므로, 짝을 지을 수 있게 0으로 바꿉니다.
+        results = pd.DataFrame(report["results"])
+        results[key[1:]] = results[key[1:]].fillna(0).astype(int)
+        return results.set_index(key)
+
+    old = frame(baseline)
+    new = frame(candidate)
+    joined = old[["seconds", "peak_mb"]].join(new[["seconds", "peak_mb"]], how="inner", lsuffix="_old", rsuffix="_new")
+    joined["time_ratio"] = joined["seconds_new"] / joined["seconds_old"]
+    joined["memory_ratio"] = joined["peak_mb_new"] / joined["peak_mb_old"]
+    joined["regression"] = (joined["time_ratio"] > threshold) | (joined["memory_ratio"] > threshold)
+    return joined.reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="분석 함수 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="벤치마크 실행")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="실행할 벤치마크")
+    run_parser.add_argument("--quick", action="store_true", help="작은 격자로 빠르게 실행")
+    run_parser.add_argument("--tickers", nargs="+", type=int, help="티커 수 목록")
+    run_parser.add_argument("--years", nargs="+", type=int, help="기간(년) 목록")
+    run_parser.add_argument("--samples", nargs="+", type=int, help="몬테카를로 표본 수 목록")
+    run_parser.add_argument("--repeat", type=int, default=3, help="조건별 반복 횟수")
+    run_parser.add_argument("--seed", type=int, default=0, help="합성 데이터 시드")
+    run_parser.add_argument("--store-dir", default=None, help="합성 데이터 저장 디렉터리 (기본: 임시 디렉터리)")
+    run_parser.add_argument("--output", default=None, help=f"결과 JSON 파일 (기본: {RESULTS_DIR}/<커밋>.json)")
+    compare_parser = subparsers.add_parser("compare", help="두 결과 비교")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="회귀로 볼 비율")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        grid = dict(QUICK_GRID if args.quick else FULL_GRID)
+        for axis in grid:
+            if getattr(args, axis):
+                grid[axis] = getattr(args, axis)
+        report = run(args.only, grid, args.repeat, args.seed, args.store_dir)
+        output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"결과를 {output}에 저장했습니다.")
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.candidate, "r", encoding="utf-8") as f:
+            candidate = json.load(f)
+        comparison = compare(baseline, candidate, args.threshold)
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(comparison.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        regressions = int(comparison["regression"].sum())
+        print(f"{baseline['meta']['commit']} -> {candidate['meta']['commit']}: 회귀 {regressions}건")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,111 @@
+"""대상 수익률(ETF 하나 또는 포트폴리오 종목들)과 수백~수천 개 시계열의 상관계수를 계산하는 엔진입니다.
+
+대상이 K개, 후보가 M개이면 N x N 전체 행렬 대신 K x M 상관계수만 구합니다. 상장일이 달라 생긴 NaN은 쌍마다 두 시계열이 모두
+있는 날짜만 쓰며(pairwise-complete, DataFrame.corr()와 같음), 이를 관측 여부 마스크와 0으로 채운 값의 행렬곱 몇 번으로
+계산하므로 쌍마다 반복하지 않습니다. 후보 열은 block_size개씩 나누어 계산해 메모리를 제한합니다.
+"""
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+# 겹치는 날짜가 이보다 적은 쌍은 상관계수를 NaN으로 둡니다 (짧은 겹침에서 나오는 우연한 ±1을 막습니다).
+MIN_PERIODS = 20
+BLOCK_SIZE = 1024
+TOP_K = 30
+LINKAGE_METHOD = "average"
+
+
+def _centered(values):
+    """NaN 마스크와, 열 평균을 빼고 NaN을 0으로 채운 값을 반환합니다.
+
+    공분산은 열마다 상수를 빼도 그대로이므로, 미리 평균을 빼 두면 원 모멘트 합계로 계산할 때의 자릿수 손실이 줄어듭니다.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    mean = filled.sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    return valid, np.where(valid, filled - mean, 0.0)
+
+
+def _pairwise_correlation(targets, candidates, min_periods):
+    """(날짜 x K)와 (날짜 x M) 배열의 쌍별 상관계수(K x M)를 겹치는 날짜만으로 계산합니다."""
+    target_valid, x = _centered(targets)
+    valid, y = _centered(candidates)
+    target_mask = target_valid.astype(float)
+    mask = valid.astype(float)
+
+    # 쌍 (i, j)의 합계는 두 시계열이 모두 있는 날짜에 대한 것이며, 다른 쪽 마스크를 곱한 행렬곱으로 한 번에 구합니다.
+    count = target_mask.T @ mask
+    sum_x = x.T @ mask
+    sum_y = target_mask.T @ y
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = x.T @ y - sum_x * sum_y / count
+        var_x = (x ** 2).T @ mask - sum_x ** 2 / count
+        var_y = target_mask.T @ y ** 2 - sum_y ** 2 / count
+        correlation = np.clip(covariance / np.sqrt(var_x * var_y), -1.0, 1.0)
+    correlation[count < max(min_periods, 2)] = np.nan
+    return correlation
+
+
+def correlate(targets, candidates, min_periods=MIN_PERIODS, block_size=BLOCK_SIZE):
+    """대상과 각 후보 시계열의 상관계수를 (후보 x 대상) DataFrame으로 반환합니다.
+
+    targets는 Series(대상 하나) 또는 DataFrame(열=대상), candidates는 (날짜 x 후보) DataFrame입니다. 날짜는 합집합으로
+    맞추고, 쌍마다 둘 다 있는 날짜가 min_periods보다 적으면 NaN입니다.
+    """
+    if isinstance(targets, pd.Series):
+        targets = targets.to_frame()
+    index = targets.index.union(candidates.index)
+    target_values = targets.reindex(index).to_numpy(dtype=float)
+    candidates = candidates.reindex(index)
+    blocks = [
+        _pairwise_correlation(target_values, candidates.iloc[:, start:start + block_size].to_numpy(dtype=float), min_periods)
+        for start in range(0, candidates.shape[1], block_size)
+    ]
+    values = np.concatenate(blocks, axis=1) if blocks else np.empty((targets.shape[1], 0))
+    return pd.DataFrame(values.T, index=candidates.columns, columns=targets.columns)
+
+
+def top_correlated(correlations, k=TOP_K, absolute=True):
+    """상관계수가 큰 상위 k개 후보를 큰 순서로 반환합니다.
+
+    correlations는 correlate()의 결과(또는 Series)이며, 대상이 여럿이면 대상들 중 가장 큰 값으로 순위를 매깁니다.
+    absolute가 참이면 음의 상관도 크기로 비교합니다. 전체 정렬 대신 부분 선택으로 상위 k개만 고릅니다.
+    """
+    frame = correlations.to_frame() if isinstance(correlations, pd.Series) else correlations
+    values = frame.to_numpy(dtype=float)
+    scores = np.abs(values) if absolute else values
+    with np.errstate(invalid="ignore"):
+        scores = np.nanmax(np.where(np.isnan(scores), -np.inf, scores), axis=1) if len(frame) else np.empty(0)
+    scores = np.where(np.isfinite(scores), scores, np.nan)
+    candidates = np.flatnonzero(~np.isnan(scores))
+    if k < len(candidates):
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return correlations.iloc[candidates]
+
+
+def correlation_matrix(returns, min_periods=MIN_PERIODS, block_size=BLOCK_SIZE):
+    """(날짜 x 시계열) 수익률의 쌍별 상관계수 행렬입니다. 시각화할 몇십 개 시계열처럼 작은 집합에 씁니다."""
+    return correlate(returns, returns, min_periods, block_size).T
+
+
+def cluster_order(matrix, method=LINKAGE_METHOD):
+    """상관계수 행렬의 계층적 군집 순서(라벨 목록)를 반환합니다.
+
+    거리는 sqrt((1 - 상관계수) / 2)이며, 상관계수가 NaN인 쌍은 무상관(거리 sqrt(1/2))으로 봅니다.
+    """
+    if len(matrix) < 3:
+        return list(matrix.index)
+    values = np.nan_to_num(matrix.to_numpy(dtype=float), nan=0.0)
+    distance = np.sqrt(np.clip((1 - values) / 2, 0, 1))
+    np.fill_diagonal(distance, 0.0)
+    distance = (distance + distance.T) / 2
+    order = leaves_list(linkage(squareform(distance, checks=False), method=method))
+    return list(matrix.index[order])
+
+
+def clustered(matrix, method=LINKAGE_METHOD):
+    """행과 열을 cluster_order 순서로 바꾼 상관계수 행렬을 반환합니다 (히트맵에서 비슷한 시계열이 모입니다)."""
+    order = cluster_order(matrix, method)
+    return matrix.loc[order, order]
@@ -0,0 +1,174 @@
+"""포트폴리오 최적화와 VaR 계산이 함께 쓰는 공분산 추정 서비스입니다.
+
+추정기는 처리한 수익률의 합, X'X, |r|², |r|⁴, |r|²r 합계를 유지하므로 새 날짜 하나는 O(N²)로 반영되고, 표본 공분산과
+Ledoit-Wolf 축소 공분산을 모두 이 합계에서 바로 계산합니다. EWMA 공분산은 감쇠 계수로 지수 가중한 X'X를 따로 유지합니다.
+같은 (티커, 창) 요청은 프로세스 전역 캐시의 추정기 하나를 공유하며, 기간이 늘어나면 새 날짜만 더합니다.
+NaN은 그날 수익률 0으로 봅니다 (포트폴리오 수익률 계산과 같은 처리).
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from pipeline import fingerprint
+
+COVARIANCE_METHODS = ("sample", "ledoit_wolf", "ewma")
+EWMA_DECAY = 0.94
+ESTIMATOR_CACHE_SIZE = 64
+
+# (티커들, 창 길이, 시작일) -> 추정기. 창이 있으면 시작일과 무관하게 최근 window개 행만 쓰므로 키에서 뺍니다.
+_estimators = OrderedDict()
+_estimators_lock = threading.Lock()
+
+
+class CovarianceEstimator:
+    """수익률의 공분산을 증분 갱신하는 추정기입니다.
+
+    window가 주어지면 마지막 window개 행만 쓰며, 창을 벗어나는 행은 링 버퍼에 보관해 두었다가 합계에서 뺍니다.
+    update()는 이미 처리한 날짜를 건너뛰고 새 날짜만 반영합니다.
+    """
+
+    def __init__(self, columns, window=None, decay=EWMA_DECAY):
+        self.columns = pd.Index(columns)
+        self.window = window
+        self.decay = decay
+        self.last_date = None
+        self.processed = 0
+        num_assets = len(self.columns)
+        self._count = 0
+        self._sum = np.zeros(num_assets)
+        self._gram = np.zeros((num_assets, num_assets))
+        self._norm2 = np.zeros(num_assets)
+        self._norm4 = 0.0
+        self._ewma = np.zeros((num_assets, num_assets))
+        self._ewma_weight = 0.0
+        self._buffer = np.zeros((window, num_assets)) if window else None
+        self._fingerprint = None
+
+    def _add(self, rows, sign):
+        squared = (rows ** 2).sum(axis=1)
+        self._count += sign * len(rows)
+        self._sum += sign * rows.sum(axis=0)
+        self._gram += sign * rows.T @ rows
+        self._norm2 += sign * squared @ rows
+        self._norm4 += sign * (squared ** 2).sum()
+
+    def update(self, returns):
+        """returns(열=티커)에서 마지막으로 처리한 날짜 이후의 행만 합계에 반영하고 자신을 반환합니다."""
+        returns = returns.reindex(columns=self.columns)
+        new = returns if self.last_date is None else returns[returns.index > self.last_date]
+        if new.empty:
+            return self
+        rows = new.to_numpy(dtype=float)
+        rows = np.where(np.isnan(rows), 0.0, rows)
+
+        if self.window:
+            # 새 행 i가 들어오면 전체 순번 processed + i - window인 행이 창을 벗어납니다.
+            kept = rows[-self.window:]
+            exiting = self.processed + np.arange(len(rows)) - self.window
+            from_buffer = exiting[(exiting >= 0) & (exiting < self.processed)]
+            self._add(self._buffer[from_buffer % self.window], -1)
+            self._add(rows, 1)
+            # 새 행 중에서도 이번 갱신 안에서 창을 벗어나는 행은 바로 뺍니다.
+            self._add(rows[:len(rows) - len(kept)], -1)
+            self._buffer[(self.processed + len(rows) - len(kept) + np.arange(len(kept))) % self.window] = kept
+        else:
+            self._add(rows, 1)
+
+        # EWMA: k개 행이 들어오면 기존 값은 decay^k배, i번째 새 행은 decay^(k-1-i)배로 가중합니다 (평균 0 가정).
+        decays = self.decay ** np.arange(len(rows) - 1, -1, -1)
+        self._ewma = self.decay ** len(rows) * self._ewma + (1 - self.decay) * (rows * decays[:, None]).T @ rows
+        self._ewma_weight = self.decay ** len(rows) * self._ewma_weight + (1 - self.decay) * decays.sum()
+
+        self.processed += len(rows)
+        self.last_date = new.index[-1]
+        self._fingerprint = self._content(returns)
+        return self
+
+    def _content(self, returns):
+        """returns에서 처리한 구간(첫 날짜부터 마지막으로 처리한 날짜까지)의 내용 해시입니다.
+
+        날짜와 값 배열의 바이트를 그대로 해시하므로 구간 중간의 수정(소급 보정 등)도 감지합니다.
+        """
+        processed = returns.loc[:self.last_date]
+        return fingerprint((processed.index.to_numpy(), processed.to_numpy(dtype=float)))
+
+    def matches(self, returns):
+        """returns가 지금까지 처리한 데이터를 그대로 포함하는지 확인합니다 (새 날짜만 덧붙은 경우 참)."""
+        return self.last_date is None or (
+            returns.index[0] <= self.last_date
+            and self._content(returns.reindex(columns=self.columns)) == self._fingerprint
+        )
+
+    @property
+    def count(self):
+        return self._count
+
+    def mean(self):
+        return pd.Series(self._sum / self._count, index=self.columns)
+
+    def _sample(self, ddof):
+        mean = self._sum / self._count
+        return (self._gram - self._count * np.outer(mean, mean)) / (self._count - ddof)
+
+    def _ledoit_wolf(self):
+        """단위행렬 배수를 목표로 하는 Ledoit-Wolf(2004) 축소 공분산입니다.
+
+        축소 강도에 필요한 sum_t |x_t|⁴ (x = r - 평균)은 유지 중인 원 모멘트 합계를 전개해서 구합니다.
+        """
+        n = self._count
+        num_assets = len(self.columns)
+        mean = self._sum / n
+        sample = self._sample(0)
+        trace = np.trace(sample)
+        trace_sq = (sample ** 2).sum()
+        mean_sq = mean @ mean
+        dot = self._sum @ mean
+        centered_norm4 = (self._norm4 + 4 * mean @ self._gram @ mean + n * mean_sq ** 2 - 4 * self._norm2 @ mean
+                          + 2 * np.trace(self._gram) * mean_sq - 4 * dot * mean_sq)
+        target = trace / num_assets
+        dispersion = (trace_sq - trace ** 2 / num_assets) / num_assets
+        noise = max((centered_norm4 - n * trace_sq) / (num_assets * n ** 2), 0.0)
+        shrinkage = min(noise, dispersion) / dispersion if dispersion > 0 else 1.0
+        return shrinkage * target * np.eye(num_assets) + (1 - shrinkage) * sample, shrinkage
+
+    def covariance(self, method="sample"):
+        """일간 공분산 행렬을 DataFrame으로 반환합니다.
+
+        method는 "sample"(불편 표본 공분산, DataFrame.cov()와 같음), "ledoit_wolf"(축소 공분산), "ewma"(평균 0의 지수 가중
+        공분산, 창과 무관하게 처리한 전체 기간에 감쇠 계수를 적용) 중 하나입니다.
+        """
+        if method == "sample":
+            matrix = self._sample(1)
+        elif method == "ledoit_wolf":
+            matrix = self._ledoit_wolf()[0]
+        elif method == "ewma":
+            matrix = self._ewma / self._ewma_weight
+        else:
+            raise ValueError(f"알 수 없는 공분산 추정 방법입니다: {method}")
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+    def shrinkage(self):
+        """Ledoit-Wolf 축소 강도(0: 표본 공분산, 1: 목표 행렬)를 반환합니다."""
+        return self._ledoit_wolf()[1]
+
+
+def shared_estimator(returns, window=None):
+    """returns의 티커와 창에 해당하는 공유 추정기를 새 날짜까지 갱신해 반환합니다.
+
+    캐시된 추정기가 처리한 구간과 returns의 같은 구간 데이터가 다르면(다른 가격 컬럼 등) 새 추정기로 바꿉니다.
+    """
+    key = (tuple(returns.columns), window, None if window else returns.index[0])
+    with _estimators_lock:
+        estimator = _estimators.get(key)
+        if estimator is None or not estimator.matches(returns):
+            estimator = CovarianceEstimator(returns.columns, window)
+            _estimators[key] = estimator
+        _estimators.move_to_end(key)
+        while len(_estimators) > ESTIMATOR_CACHE_SIZE:
+            _estimators.popitem(last=False)
+        return estimator.update(returns)
+
+
+def covariance(returns, method="sample", window=None):
+    """(날짜 x 티커) 수익률의 일간 공분산 DataFrame을 공유 추정기에서 반환합니다."""
+    return shared_estimator(returns, window).covariance(method)
@@ -1,14 +1,85 @@
-import yfinance as yf
+import threading
+from collections import OrderedDict
+import pandas as pd
 import streamlit as st
+from price_store import DAILY, get_prices, get_prices_batch
+from providers import get_provider
+
+# 매크로 탭의 비교 유니버스(1,000개 이상)를 한 번에 담을 수 있는 크기입니다.
+RETURNS_CACHE_SIZE = 4096
+# 모든 분석이 같은 (티커, 기간, 컬럼) 캐시 키를 쓰도록 수익률은 배당을 반영한 수정 종가로 통일합니다.
+RETURNS_FIELD = 'Adj Close'
+
+# (제공자, 티커, 시작일, 종료일, 컬럼) -> 일간 수익률 Series. 프로세스 전체에서 공유합니다.
+_returns_cache = OrderedDict()
+_returns_cache_lock = threading.Lock()
 
 @st.cache_data
-def load_data(ticker, start_date, end_date):
+def load_data(ticker, start_date, end_date, interval=DAILY):
     try:
-        data = yf.download(ticker, start=start_date, end=end_date)
+        data = get_prices(ticker, start_date, end_date, interval=interval)
         if data.empty:
             st.warning(f"{ticker}에 대한 데이터를 찾을 수 없습니다.")
             return None
         return data
     except Exception as e:
         st.error(f"{ticker} 데이터 다운로드 중 오류 발생: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def _returns_key(ticker, start_date, end_date, field):
+    return get_provider().name, ticker, pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), field
+
+def _cached_returns(tickers, start_date, end_date, field):
+    """캐시된 수익률 Series를 모으고, 캐시에 없는 티커만 한 번에 내려받아 채웁니다."""
+    tickers = list(dict.fromkeys(tickers))
+    returns = {}
+    missing = []
+    with _returns_cache_lock:
+        for ticker in tickers:
+            key = _returns_key(ticker, start_date, end_date, field)
+            if key in _returns_cache:
+                _returns_cache.move_to_end(key)
+                returns[ticker] = _returns_cache[key]
+            else:
+                missing.append(ticker)
+
+    if missing:
+        prices = get_prices_batch(missing, start_date, end_date)
+        with _returns_cache_lock:
+            for ticker, data in prices.items():
+                if data.empty or field not in data:
+                    continue
+                series = data[field].pct_change().dropna()
+                # 캐시된 값은 여러 분석이 복사 없이 함께 보므로 읽기 전용으로 둡니다.
+                values = series.to_numpy(dtype=float, copy=True)
+                values.flags.writeable = False
+                series = pd.Series(values, index=series.index, name=ticker, copy=False)
+                _returns_cache[_returns_key(ticker, start_date, end_date, field)] = series
+                returns[ticker] = series
+            while len(_returns_cache) > RETURNS_CACHE_SIZE:
+                _returns_cache.popitem(last=False)
+
+    return {ticker: returns[ticker] for ticker in tickers if ticker in returns}
+
+def load_return_series(ticker, start_date, end_date, field=RETURNS_FIELD):
+    """티커의 일간 수익률 Series를 반환하며, 데이터가 없으면 None입니다.
+
+    값은 복사하지 않고 캐시와 공유하는 얕은 복사본입니다. 공유하는 값 배열은 읽기 전용이라 제자리 수정은 (Copy-on-Write에서는
+    복사본에 적용되거나) 오류가 나므로 캐시가 바뀌지 않고, 이름이나 인덱스를 바꿔도 캐시 객체에는 영향이 없습니다.
+    """
+    series = _cached_returns([ticker], start_date, end_date, field).get(ticker)
+    return None if series is None else series.copy(deep=False)
+
+def load_returns(tickers, start_date, end_date, field=RETURNS_FIELD):
+    """여러 티커의 일간 수익률을 날짜 기준으로 정렬된 DataFrame으로 반환합니다.
+
+    수익률은 (티커, 기간, 컬럼)별로 프로세스 전역 캐시에 한 번만 계산되므로, 한 번의 화면 렌더링에서 같은 티커를 여러 분석이 요청해도
+    다운로드와 pct_change 계산은 한 번만 일어납니다. 데이터가 없는 티커는 결과 컬럼에서 빠집니다. 티커가 하나이면 캐시의 읽기 전용 값을
+    복사 없이 공유합니다.
+    """
+    returns = _cached_returns(tickers, start_date, end_date, field)
+    if not returns:
+        return pd.DataFrame()
+    if len(returns) == 1:
+        return next(iter(returns.values())).to_frame()
+    return pd.concat(returns, axis=1)
@@ -0,0 +1,78 @@
+import os
+import time
+import pickle
+import hashlib
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+
+def make_key(*parts):
+    """여러 값을 이어 붙여 캐시 키로 쓸 해시 문자열을 만듭니다."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """항목마다 파일 하나로 저장되는, 프로세스 재시작 후에도 유지되는 TTL 캐시입니다."""
+
+    def __init__(self, name, ttl):
+        self.directory = os.path.join(CACHE_DIR, name)
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, make_key(key) + ".pkl")
+
+    def get_entry(self, key):
+        """만료 여부와 관계없이 (값, 저장 시각)을 반환합니다. 없으면 None입니다."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def is_fresh(self, entry):
+        """항목이 아직 TTL 안에 있는지 확인합니다."""
+        return entry is not None and time.time() - entry[1] < self.ttl
+
+    def get(self, key, default=None):
+        """만료되지 않은 값을 반환하고, 만료된 항목은 지웁니다."""
+        entry = self.get_entry(key)
+        if entry is None:
+            return default
+        if not self.is_fresh(entry):
+            self.delete(key)
+            return default
+        return entry[0]
+
+    def set(self, key, value):
+        """값을 현재 시각과 함께 저장합니다."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump((value, time.time()), f)
+        os.replace(path + ".tmp", path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def evict_expired(self):
+        """TTL이 지난 항목을 모두 지웁니다."""
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as f:
+                    _, stored_at = pickle.load(f)
+                if now - stored_at >= self.ttl:
+                    os.remove(path)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                continue
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+MAX_CHART_POINTS = 2000
+
+
+def minmax_indices(y, max_points=MAX_CHART_POINTS):
+    """구간마다 처음, 최솟값, 최댓값, 마지막 점의 위치만 남깁니다 (M4 방식).
+
+    각 구간의 극값을 그대로 보존하므로 선 그래프의 모양(급등락 포함)이 원본과 같게 그려집니다.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 4)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    first = starts
+    last = np.minimum(starts + size - 1, n - 1)
+    lowest = starts + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highest = starts + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    indices = np.unique(np.concatenate([first, lowest, highest, last]))
+    return indices[indices < n]
+
+
+def lttb_indices(x, y, max_points=MAX_CHART_POINTS):
+    """Largest-Triangle-Three-Buckets 알고리즘으로 남길 점의 위치를 고릅니다.
+
+    구간마다 이전에 고른 점, 다음 구간의 평균점과 만드는 삼각형의 넓이가 가장 큰 점을 골라 시각적 모양을 유지합니다.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(max_points - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        average_x = x[stop:next_stop].mean()
+        average_y = np.nanmean(y[stop:next_stop]) if stop < next_stop else y[-1]
+        area = np.abs((x[selected] - average_x) * (y[start:stop] - y[selected])
+                      - (x[selected] - x[start:stop]) * (average_y - y[selected]))
+        selected = start + int(np.argmax(np.nan_to_num(area, nan=-1)))
+        indices[i + 1] = selected
+    return indices
+
+
+def downsample(series, max_points=MAX_CHART_POINTS, method="minmax"):
+    """차트로 보낼 Series를 최대 max_points개 점으로 줄입니다. method는 "minmax" 또는 "lttb"입니다."""
+    if len(series) <= max_points:
+        return series
+    if method == "lttb":
+        x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+        return series.iloc[lttb_indices(x, series.to_numpy(), max_points)]
+    return series.iloc[minmax_indices(series.to_numpy(), max_points)]
@@ -1,8 +1,37 @@
-import yfinance as yf
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 import streamlit as st
+from data_loader import load_returns
+from metrics import compute_risk_metrics, metrics_frame
+from correlation import correlate, correlation_matrix, top_correlated, clustered
+from rolling import RollingMetrics, RollingFactorLoadings
+from factor_model import FACTOR_TICKERS, INTERCEPT, fit_factor_model
+from ticker_info import prefetch_info
+
+ROLLING_ENGINE_CACHE_SIZE = 64
+
+# (분석 종류, 티커들, 창 길이, 시작일) -> 롤링 엔진. 종료일이 늘어나면 새로 들어온 날짜만 엔진에 넘깁니다.
+_rolling_engines = OrderedDict()
+_rolling_engines_lock = threading.Lock()
+
+# 매크로 지표 티커
+MACRO_INDICATORS = {
+    'S&P 500': '^GSPC',
+    '10Y Treasury Yield': '^TNX',
+    'VIX': '^VIX',
+    'Gold': 'GC=F',
+    'Oil': 'CL=F',
+    'USD Index': 'DX-Y.NYB',
+    'Inflation Expectation (5Y)': '^FVX',
+    'High Yield Bonds': 'HYG',
+    'Emerging Markets': 'EEM',
+    'Real Estate': 'VNQ',
+    'Investment Grade Bonds': 'LQD',
+    'Developed Markets': 'EFA',
+    'Commodities': 'DBC'
+}
 
 def analyze_etf(data, ticker):
     daily_returns = data['Adj Close'].pct_change()
@@ -11,7 +40,6 @@ def analyze_etf(data, ticker):
     risk_free_rate = 2.0  # 예시로 2% 사용
     sharpe_ratio = (annualized_return - risk_free_rate) / annualized_volatility
     
-    etf = yf.Ticker(ticker)
     #경비 비율 제거
     etf_info = {
         "연간 수익률": f"{annualized_return:.2f}%",
@@ -25,101 +53,62 @@ def analyze_risk_and_benchmark(etf_data, benchmark_data, etf_ticker, benchmark_t
     etf_returns = etf_data['Close'].pct_change()
     benchmark_returns = benchmark_data['Close'].pct_change()
     
-    covariance = etf_returns.cov(benchmark_returns)
-    variance = benchmark_returns.var()
-    beta = covariance / variance
-    
-    cum_returns = (1 + etf_returns).cumprod()
-    running_max = cum_returns.cummax()
-    drawdown = (cum_returns - running_max) / running_max
-    max_drawdown = drawdown.min()
-    
-    tracking_error = (etf_returns - benchmark_returns).std() * np.sqrt(252)
-    
-    risk_free_rate = 0.02 / 252  # 일일 무위험 수익률 (예: 2% 연간)
-    etf_excess_return = etf_returns - risk_free_rate
-    benchmark_excess_return = benchmark_returns - risk_free_rate
-    alpha = etf_excess_return.mean() - (beta * benchmark_excess_return.mean())
-    alpha = alpha * 252  # 연간화
-    
-    sharpe_ratio = (etf_returns.mean() - risk_free_rate) / etf_returns.std() * np.sqrt(252)
+    metrics = compute_risk_metrics(etf_returns, benchmark_returns)
     
     risk_metrics = {
-        "Beta": beta,
-        "Alpha": alpha,
-        "Sharpe Ratio": sharpe_ratio,
-        "Max Drawdown": max_drawdown,
-        "Volatility": etf_returns.std() * np.sqrt(252)
+        "Beta": metrics["Beta"],
+        "Alpha": metrics["Alpha"],
+        "Sharpe Ratio": metrics["Sharpe Ratio"],
+        "Max Drawdown": metrics["Max Drawdown"],
+        "Volatility": metrics["Volatility"],
+        "Tracking Error": metrics["Tracking Error"]
     }
     
     return risk_metrics
 
-def analyze_factor_exposure(etf_ticker, start_date, end_date):
+def analyze_factor_regression(etf_ticker, start_date, end_date, ridge=0.0):
+    """ETF의 팩터 회귀 결과(절편과 팩터별 계수, t-통계량)와 결정계수를 반환합니다. 실패하면 빈 DataFrame과 NaN입니다."""
     try:
-        etf_data = yf.download(etf_ticker, start=start_date, end=end_date)
-        if etf_data.empty:
+        # ETF와 팩터 티커를 한 번에 내려받습니다
+        returns = load_returns([etf_ticker] + list(FACTOR_TICKERS.values()), start_date, end_date)
+        if etf_ticker not in returns:
             st.error(f"{etf_ticker}에 대한 데이터를 찾을 수 없습니다.")
-            return pd.Series()
-        
-        etf_returns = etf_data['Close'].pct_change().dropna()
-
-        # 팩터 티커
-        factor_tickers = {
-            'Market': '^GSPC',
-            'Size': 'IWM',
-            'Value': 'IWD',
-            'Growth': 'IWF',
-            'Momentum': 'MTUM',
-            'Quality': 'QUAL',
-            'Low Volatility': 'USMV',
-            'Dividend': 'DVY',
-            'High Yield': 'HYG',
-            'International': 'EFA',
-            'Emerging Markets': 'EEM'
-        }
+            return pd.DataFrame(), np.nan
 
         factor_data = pd.DataFrame()
-        for factor, ticker in factor_tickers.items():
-            try:
-                factor_data_temp = yf.download(ticker, start=start_date, end=end_date)
-                if not factor_data_temp.empty:
-                    factor_returns = factor_data_temp['Close'].pct_change().dropna()
-                    factor_data[factor] = factor_returns
-                else:
-                    st.warning(f"{factor} ({ticker})에 대한 데이터를 찾을 수 없습니다.")
-            except Exception as e:
-                st.warning(f"{factor} ({ticker}) 데이터 다운로드 중 오류 발생: {str(e)}")
+        for factor, ticker in FACTOR_TICKERS.items():
+            if ticker in returns:
+                factor_data[factor] = returns[ticker]
+            else:
+                st.warning(f"{factor} ({ticker})에 대한 데이터를 찾을 수 없습니다.")
 
         # 팩터 데이터가 비어있을 경우
         if factor_data.empty:
             st.error("팩터 데이터를 가져올 수 없습니다.")
-            return pd.Series()
+            return pd.DataFrame(), np.nan
 
-        # ETF와 팩터 데이터를 정렬 및 병합
-        aligned_data = pd.concat([etf_returns.rename('ETF'), factor_data], axis=1).dropna()
-        if aligned_data.empty:
-            st.error("정렬된 데이터가 없습니다.")
-            return pd.Series()
-
-        # 독립 변수(X)와 종속 변수(y) 정의
-        X = aligned_data[factor_tickers.keys()]
-        y = aligned_data['ETF']
-
-        # 회귀 분석 수행
-        if len(X) == 0 or len(y) == 0:
+        # 회귀 분석 수행 (ETF와 팩터가 모두 관측된 날짜만 사용)
+        model = fit_factor_model(returns[[etf_ticker]], factor_data, ridge)
+        if model['Observations'][etf_ticker] < len(factor_data.columns) + 2:
             st.error("분석에 필요한 데이터가 충분하지 않습니다.")
-            return pd.Series()
+            return pd.DataFrame(), np.nan
 
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # 팩터 노출도 반환
-        factor_exposure = pd.Series(model.coef_, index=X.columns)
-        return factor_exposure
+        regression = pd.DataFrame({
+            'Coefficient': model['Coefficient'].loc[etf_ticker],
+            't-stat': model['t-stat'].loc[etf_ticker],
+        })
+        return regression, model['R2'][etf_ticker]
 
     except Exception as e:
         st.error(f"팩터 노출도 분석 중 오류 발생: {str(e)}")
+        return pd.DataFrame(), np.nan
+
+def analyze_factor_exposure(etf_ticker, start_date, end_date, ridge=0.0):
+    """ETF의 팩터별 노출도(회귀 기울기)를 Series로 반환합니다."""
+    regression, _ = analyze_factor_regression(etf_ticker, start_date, end_date, ridge)
+    if regression.empty:
         return pd.Series()
+    return regression['Coefficient'].drop(INTERCEPT)
 
 
 def compare_etfs(etf_tickers, start_date, end_date):
@@ -128,32 +117,25 @@ def compare_etfs(etf_tickers, start_date, end_date):
         return pd.DataFrame()
 
     comparison_data = []
+    all_returns = load_returns(etf_tickers, start_date, end_date)
+    available = [ticker for ticker in etf_tickers if ticker in all_returns]
+    # 모든 ETF의 지표를 한 번에 계산합니다 (기존 비교 표와 같이 무위험 수익률 0 기준 샤프 비율)
+    metrics = metrics_frame(all_returns[available], risk_free_rate=0) if available else pd.DataFrame()
+    
+    infos = prefetch_info(available)
     
     for ticker in etf_tickers:
-        etf = yf.Ticker(ticker)
-        hist_data = etf.history(start=start_date, end=end_date)
-        
-        if hist_data.empty:
+        if ticker not in metrics.index:
             st.warning(f"{ticker}에 대한 데이터를 찾을 수 없습니다.")
             continue
 
-        returns = hist_data['Close'].pct_change().dropna()
-        annual_return = returns.mean() * 252
-        volatility = returns.std() * np.sqrt(252)
-        sharpe_ratio = annual_return / volatility
-        
-        cum_returns = (1 + returns).cumprod()
-        running_max = cum_returns.cummax()
-        drawdown = (cum_returns - running_max) / running_max
-        max_drawdown = drawdown.min()
-        
-        info = etf.info
+        info = infos.get(ticker, {})
         
         comparison_data.append({
             'ETF': ticker,
-            'Annual Return': annual_return,
-            'Sharpe Ratio': sharpe_ratio,
-            'Max Drawdown': max_drawdown,
+            'Annual Return': metrics.at[ticker, 'Annual Return'],
+            'Sharpe Ratio': metrics.at[ticker, 'Sharpe Ratio'],
+            'Max Drawdown': metrics.at[ticker, 'Max Drawdown'],
             'Expense Ratio': info.get('expenseRatio', None),
             'AUM': info.get('totalAssets', None),
             'Yield': info.get('yield', None)
@@ -161,55 +143,130 @@ def compare_etfs(etf_tickers, start_date, end_date):
     
     return pd.DataFrame(comparison_data)
 
-def analyze_macro_market_correlation(etf_ticker, start_date, end_date):
+def analyze_macro_market_correlation(etf_ticker, start_date, end_date, universe=(), top_k=None, cluster=False):
+    """ETF(또는 포트폴리오 종목 목록)와 매크로 지표, universe 시계열 사이의 상관관계 행렬을 반환합니다.
+
+    대상과 각 시계열의 상관계수만 먼저 구하고, top_k가 주어지면 절댓값 상위 top_k개 시계열만 남겨 그 사이의 행렬을 만듭니다.
+    NaN은 쌍마다 둘 다 있는 날짜만 쓰며, cluster가 참이면 행과 열을 계층적 군집 순서로 정렬합니다.
+    """
     try:
-        etf_data = yf.download(etf_ticker, start=start_date, end=end_date)
-        if etf_data.empty:
-            st.error(f"{etf_ticker}에 대한 데이터를 찾을 수 없습니다.")
+        targets = [etf_ticker] if isinstance(etf_ticker, str) else list(dict.fromkeys(etf_ticker))
+        indicator_tickers = list(MACRO_INDICATORS.values())
+        universe = [ticker for ticker in dict.fromkeys(universe) if ticker not in targets and ticker not in indicator_tickers]
+        # ETF와 지표, 비교 시계열을 한 번에 내려받습니다
+        returns = load_returns(targets + indicator_tickers + universe, start_date, end_date)
+        missing = [ticker for ticker in targets if ticker not in returns]
+        if missing:
+            st.error(f"{', '.join(missing)}에 대한 데이터를 찾을 수 없습니다.")
             return pd.DataFrame()
-        etf_returns = etf_data['Close'].pct_change().dropna()
-        
-        indicators = {
-            'S&P 500': '^GSPC',
-            '10Y Treasury Yield': '^TNX',
-            'VIX': '^VIX',
-            'Gold': 'GC=F',
-            'Oil': 'CL=F',
-            'USD Index': 'DX-Y.NYB',
-            'Inflation Expectation (5Y)': '^FVX',
-            'High Yield Bonds': 'HYG',
-            'Emerging Markets': 'EEM',
-            'Real Estate': 'VNQ',
-            'Investment Grade Bonds': 'LQD',
-            'Developed Markets': 'EFA',
-            'Commodities': 'DBC'
-        }
-        
-        indicator_data = pd.DataFrame()
-        for name, ticker in indicators.items():
-            try:
-                ind_data = yf.download(ticker, start=start_date, end=end_date)
-                if not ind_data.empty:
-                    indicator_data[name] = ind_data['Close'].pct_change().dropna()
-                else:
-                    st.warning(f"{name} ({ticker})에 대한 데이터를 찾을 수 없습니다.")
-            except Exception as e:
-                st.warning(f"{name} ({ticker}) 데이터 다운로드 중 오류 발생: {str(e)}")
-        
-        if indicator_data.empty:
+
+        names = {}
+        for name, ticker in MACRO_INDICATORS.items():
+            if ticker in returns:
+                names[ticker] = name
+            else:
+                st.warning(f"{name} ({ticker})에 대한 데이터를 찾을 수 없습니다.")
+        missing = [ticker for ticker in universe if ticker not in returns]
+        if missing:
+            st.warning(f"비교 시계열 {len(missing)}개의 데이터를 찾을 수 없습니다: {', '.join(missing[:10])}")
+        names.update((ticker, ticker) for ticker in universe if ticker in returns)
+
+        if not names:
             st.error("지표 데이터를 가져올 수 없습니다.")
             return pd.DataFrame()
-        
-        all_data = pd.concat([etf_returns.rename(etf_ticker), indicator_data], axis=1).dropna()
-        if all_data.empty:
+        target_returns = returns[targets]
+        candidates = returns[list(names)].set_axis(list(names.values()), axis=1)
+
+        correlations = correlate(target_returns, candidates)
+        selected = top_correlated(correlations, top_k) if top_k else correlations.dropna(how='all')
+        if selected.empty:
             st.error("분석에 필요한 데이터가 충분하지 않습니다.")
             return pd.DataFrame()
-        
-        correlation = all_data.corr()
-        
-        return correlation
+
+        correlation = correlation_matrix(pd.concat([target_returns, candidates[selected.index]], axis=1))
+        return clustered(correlation) if cluster else correlation
 
     except Exception as e:
         st.error(f"매크로 및 마켓 상황 연관성 분석 중 오류 발생: {str(e)}")
         return pd.DataFrame()
 
+
+def _rolling_engine(key, factory):
+    with _rolling_engines_lock:
+        if key in _rolling_engines:
+            _rolling_engines.move_to_end(key)
+        else:
+            _rolling_engines[key] = factory()
+            while len(_rolling_engines) > ROLLING_ENGINE_CACHE_SIZE:
+                _rolling_engines.popitem(last=False)
+        return _rolling_engines[key]
+
+def _rolling_window(engine, returns, *args):
+    """엔진에 아직 처리하지 않은 날짜만 넘기고, 요청한 기간의 결과를 반환합니다."""
+    with _rolling_engines_lock:
+        engine.update(returns, *args)
+        return engine.result.loc[:returns.index[-1]]
+
+def analyze_rolling_risk(etf_ticker, benchmark_ticker, start_date, end_date, window=126):
+    """ETF의 롤링 변동성, 샤프 비율, 벤치마크 대비 베타와 상관계수를 날짜별 DataFrame으로 반환합니다."""
+    try:
+        returns = load_returns([etf_ticker, benchmark_ticker], start_date, end_date)
+        if etf_ticker not in returns or benchmark_ticker not in returns:
+            st.error(f"{etf_ticker} 또는 {benchmark_ticker}에 대한 데이터를 찾을 수 없습니다.")
+            return pd.DataFrame()
+
+        key = ('risk', etf_ticker, benchmark_ticker, window, pd.Timestamp(start_date))
+        engine = _rolling_engine(key, lambda: RollingMetrics([etf_ticker], window))
+        result = _rolling_window(engine, returns[[etf_ticker]], returns[benchmark_ticker])
+        return result.xs(etf_ticker, axis=1, level=1)
+
+    except Exception as e:
+        st.error(f"롤링 리스크 분석 중 오류 발생: {str(e)}")
+        return pd.DataFrame()
+
+def analyze_rolling_factor_exposure(etf_ticker, start_date, end_date, window=126, ridge=0.0):
+    """ETF의 롤링 팩터 노출도를 날짜 x 팩터 DataFrame으로 반환합니다."""
+    try:
+        returns = load_returns([etf_ticker] + list(FACTOR_TICKERS.values()), start_date, end_date)
+        if etf_ticker not in returns:
+            st.error(f"{etf_ticker}에 대한 데이터를 찾을 수 없습니다.")
+            return pd.DataFrame()
+
+        factors = {factor: ticker for factor, ticker in FACTOR_TICKERS.items() if ticker in returns}
+        if not factors:
+            st.error("팩터 데이터를 가져올 수 없습니다.")
+            return pd.DataFrame()
+        factor_returns = returns[list(factors.values())].set_axis(list(factors), axis=1)
+
+        key = ('factor', etf_ticker, tuple(factors), window, ridge, pd.Timestamp(start_date))
+        engine = _rolling_engine(key, lambda: RollingFactorLoadings(list(factors), [etf_ticker], window, ridge))
+        result = _rolling_window(engine, returns[[etf_ticker]], factor_returns)
+        return result[etf_ticker].drop(columns=INTERCEPT)
+
+    except Exception as e:
+        st.error(f"롤링 팩터 노출도 분석 중 오류 발생: {str(e)}")
+        return pd.DataFrame()
+
+def analyze_rolling_macro_correlation(etf_ticker, start_date, end_date, window=126):
+    """ETF와 각 매크로 지표의 롤링 상관계수를 날짜 x 지표 DataFrame으로 반환합니다."""
+    try:
+        returns = load_returns([etf_ticker] + list(MACRO_INDICATORS.values()), start_date, end_date)
+        if etf_ticker not in returns:
+            st.error(f"{etf_ticker}에 대한 데이터를 찾을 수 없습니다.")
+            return pd.DataFrame()
+
+        indicators = {name: ticker for name, ticker in MACRO_INDICATORS.items() if ticker in returns}
+        if not indicators:
+            st.error("지표 데이터를 가져올 수 없습니다.")
+            return pd.DataFrame()
+        indicator_returns = returns[list(indicators.values())].set_axis(list(indicators), axis=1)
+
+        # 상관계수는 대칭이므로 지표들을 열로, ETF를 벤치마크로 두고 한 번에 계산합니다.
+        key = ('macro', etf_ticker, tuple(indicators), window, pd.Timestamp(start_date))
+        engine = _rolling_engine(key, lambda: RollingMetrics(list(indicators), window))
+        result = _rolling_window(engine, indicator_returns, returns[etf_ticker])
+        return result['Correlation']
+
+    except Exception as e:
+        st.error(f"롤링 매크로 상관관계 분석 중 오류 발생: {str(e)}")
+        return pd.DataFrame()
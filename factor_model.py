@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# 팩터 티커
+FACTOR_TICKERS = {
+    'Market': '^GSPC',
+    'Size': 'IWM',
+    'Value': 'IWD',
+    'Growth': 'IWF',
+    'Momentum': 'MTUM',
+    'Quality': 'QUAL',
+    'Low Volatility': 'USMV',
+    'Dividend': 'DVY',
+    'High Yield': 'HYG',
+    'International': 'EFA',
+    'Emerging Markets': 'EEM'
+}
+
+INTERCEPT = 'Intercept'
+
+
+def _inverse(matrix):
+    try:
+        return np.linalg.inv(matrix)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(matrix)
+
+
+def solve_factor_model(n, sx, sy, sxx, sxy, syy, ridge=0.0):
+    """관측치 합계만으로 여러 대상의 팩터 회귀를 한 번에 풉니다.
+
+    n은 관측치 수, sx와 sxx는 팩터의 합과 X'X, sy와 syy는 대상의 합과 제곱합, sxy는 X'y이며
+    앞쪽 축(예: 롤링 창)은 모두 배치로 처리합니다. 절편은 벌점 없이 따로 추정하고, ridge는 중심화한 X'X의
+    평균 대각 원소에 대한 비율로 기울기에 L2 벌점을 줍니다. 기울기 표준오차는 리지 샌드위치 공식을 씁니다.
+    {'coef': (..., 1 + 팩터 수, 대상 수), 'tstat': 같은 모양, 'r2': (..., 대상 수)} 딕셔너리를 반환합니다.
+    """
+    n = np.asarray(n, dtype=float)
+    k = sx.shape[-1]
+    mean_x = sx / n[..., None]
+    mean_y = sy / n[..., None]
+    cxx = sxx - n[..., None, None] * mean_x[..., :, None] * mean_x[..., None, :]
+    cxy = sxy - n[..., None, None] * mean_x[..., :, None] * mean_y[..., None, :]
+    cyy = syy - n[..., None] * mean_y ** 2
+
+    penalty = ridge * np.trace(cxx, axis1=-2, axis2=-1) / k
+    a_inv = _inverse(cxx + penalty[..., None, None] * np.eye(k))
+    beta = a_inv @ cxy
+    intercept = mean_y - np.einsum('...k,...km->...m', mean_x, beta)
+
+    rss = cyy - 2 * (beta * cxy).sum(axis=-2) + (beta * (cxx @ beta)).sum(axis=-2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s2 = np.maximum(rss, 0) / (n - k - 1)[..., None]
+        sandwich = a_inv @ cxx @ a_inv
+        beta_var = np.diagonal(sandwich, axis1=-2, axis2=-1)[..., :, None] * s2[..., None, :]
+        intercept_var = s2 * (1 / n + np.einsum('...k,...kl,...l->...', mean_x, sandwich, mean_x))[..., None]
+        coef = np.concatenate([intercept[..., None, :], beta], axis=-2)
+        stderr = np.sqrt(np.concatenate([intercept_var[..., None, :], beta_var], axis=-2))
+        return {'coef': coef, 'tstat': coef / stderr, 'r2': 1 - rss / cyy}
+
+
+def fit_factor_model(target_returns, factor_returns, ridge=0.0):
+    """여러 ETF의 수익률(열=ETF)을 팩터 수익률(열=팩터)에 다중 대상 최소제곱으로 한 번에 회귀합니다.
+
+    팩터가 모두 관측된 날짜만 사용하고, 관측 날짜가 같은 ETF끼리 묶어 묶음마다 X'X를 한 번만 계산합니다
+    (상장일이 다른 ETF가 섞여 있어도 대부분 몇 개의 묶음으로 끝납니다). 관측치가 팩터 수 + 2보다 적은 ETF는 NaN입니다.
+    {'Coefficient': ETF x 항 DataFrame, 't-stat': 같은 모양, 'R2': Series, 'Observations': Series} 딕셔너리를 반환합니다.
+    """
+    factor_returns = factor_returns.dropna()
+    terms = [INTERCEPT] + list(factor_returns.columns)
+    targets = target_returns.columns
+    x = factor_returns.to_numpy(dtype=float)
+    y = target_returns.reindex(factor_returns.index).to_numpy(dtype=float)
+    k = x.shape[1]
+
+    coef = np.full((len(targets), k + 1), np.nan)
+    tstat = np.full((len(targets), k + 1), np.nan)
+    r2 = np.full(len(targets), np.nan)
+    valid = ~np.isnan(y)
+    observations = valid.sum(axis=0)
+    if len(targets):
+        patterns, groups = np.unique(valid.T, axis=0, return_inverse=True)
+        for group, mask in enumerate(patterns):
+            columns = np.flatnonzero((groups.ravel() == group) & (observations >= k + 2))
+            if not len(columns):
+                continue
+            xg = x[mask]
+            yg = y[mask][:, columns]
+            result = solve_factor_model(len(xg), xg.sum(axis=0), yg.sum(axis=0), xg.T @ xg, xg.T @ yg,
+                                        (yg ** 2).sum(axis=0), ridge)
+            coef[columns] = result['coef'].T
+            tstat[columns] = result['tstat'].T
+            r2[columns] = result['r2']
+
+    return {
+        'Coefficient': pd.DataFrame(coef, index=targets, columns=terms),
+        't-stat': pd.DataFrame(tstat, index=targets, columns=terms),
+        'R2': pd.Series(r2, index=targets),
+        'Observations': pd.Series(observations, index=targets),
+    }
@@ -0,0 +1,91 @@
+"""테스트용 로컬 OpenAI 호환 엔드포인트입니다.
+
+    python fake_openai.py --port 8001 --delay 1.0
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=fake streamlit run main.py
+"""
+import json
+import time
+import argparse
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_completion(messages):
+    """요청 내용에 따라 결정되는 가짜 응답 텍스트를 만듭니다."""
+    prompt = messages[-1]["content"] if messages else ""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    return f"[fake analysis {digest}] 프롬프트 길이 {len(prompt)}자에 대한 테스트 응답입니다."
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    token_delay = 0.0
+    request_count = 0
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        type(self).request_count += 1
+        time.sleep(self.delay)
+
+        content = fake_completion(body.get("messages", []))
+        if body.get("stream"):
+            self._stream(body, content)
+            return
+        payload = {
+            "id": f"chatcmpl-fake-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, content):
+        """응답을 단어 단위 청크로 나누어 server-sent events로 보냅니다."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": f"chatcmpl-fake-{self.request_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8001, delay=0.0, token_delay=0.0):
+    """가짜 엔드포인트 서버를 만들어 반환합니다. serve_forever()로 실행합니다."""
+    handler = type("Handler", (FakeOpenAIHandler,), {"delay": delay, "token_delay": token_delay})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 가짜 OpenAI 엔드포인트")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="응답마다 기다릴 시간(초)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="스트리밍 청크마다 기다릴 시간(초)")
+    args = parser.parse_args()
+    server = serve(args.port, args.delay, args.token_delay)
+    print(f"Fake OpenAI endpoint: http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
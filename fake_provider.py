@@ -0,0 +1,91 @@
+"""요청 스케줄러를 실제 데이터 제공자 없이 시험하기 위한, 실패와 지연을 주입하는 가짜 제공자입니다.
+
+    python fake_provider.py --requests 200 --tickers 20 --failure-rate 0.3 --latency 0.05 --rate 50
+"""
+import time
+import random
+import argparse
+import threading
+from providers import MarketDataProvider, SyntheticProvider, DAILY
+from scheduler import RequestScheduler
+
+
+class ProviderError(Exception):
+    """가짜 제공자가 주입한 실패입니다."""
+
+
+class FakeProvider(MarketDataProvider):
+    """다른 제공자(기본값은 SyntheticProvider)를 감싸, 요청마다 latency초를 기다리고 failure_rate 확률로 실패하게 합니다.
+
+    throttle_rate를 주면 초당 그보다 많은 요청이 들어올 때 속도 제한 오류를 냅니다. 원격 제공자처럼 취급되므로
+    set_provider()로 설치하면 모든 요청이 요청 스케줄러를 거칩니다.
+    """
+
+    name = "fake"
+    remote = True
+
+    def __init__(self, failure_rate=0.0, latency=0.0, throttle_rate=None, seed=None, source=None):
+        self.source = source or SyntheticProvider()
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._recent = []
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0] + [now]
+            throttled = self.throttle_rate is not None and len(self._recent) > self.throttle_rate
+            failed = throttled or self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        time.sleep(self.latency)
+        if throttled:
+            raise ProviderError("Too Many Requests. Rate limited.")
+        if failed:
+            raise ProviderError("injected failure")
+
+    def download(self, tickers, start, end, interval=DAILY):
+        self._request()
+        return self.source.download(tickers, start, end, interval)
+
+    def info(self, ticker):
+        self._request()
+        return self.source.info(ticker)
+
+
+def run_load_test(provider, scheduler, num_requests, num_tickers, start="2020-01-01", end="2021-01-01"):
+    """같은 티커가 섞인 요청을 동시에 보내고 (성공 수, 실패 수, 걸린 시간)을 반환합니다."""
+    tickers = [f"FAKE{i}" for i in range(num_tickers)]
+    started = time.perf_counter()
+    futures = []
+    for i in range(num_requests):
+        ticker = tickers[i % num_tickers]
+        futures.append(scheduler.submit(("prices", ticker, start, end), provider.download, [ticker], start, end))
+    succeeded = sum(1 for future in futures if future.exception() is None)
+    return succeeded, len(futures) - succeeded, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 제공자에 대한 요청 스케줄러 부하 시험")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=None, help="초당 허용 요청 수 (넘으면 속도 제한 오류)")
+    parser.add_argument("--rate", type=float, default=50, help="스케줄러의 초당 요청 수")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.failure_rate, args.latency, args.throttle_rate, seed=0)
+    scheduler = RequestScheduler(max_workers=args.workers, rate=args.rate, burst=args.workers,
+                                 max_retries=args.retries, base_delay=0.05, max_delay=1.0)
+    succeeded, failed, elapsed = run_load_test(provider, scheduler, args.requests, args.tickers)
+    print(f"성공 {succeeded}, 실패 {failed}, {elapsed:.2f}초")
+    print(f"제공자 호출 {provider.calls}회 (주입된 실패 {provider.failures}회), 스케줄러 통계: {dict(scheduler.stats)}")
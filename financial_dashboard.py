@@ -1,10 +1,10 @@
-import yfinance as yf
 import streamlit as st
+from ticker_info import get_info
 
 def load_ticker_data(ticker):
     """주어진 티커에 대한 재무 정보를 가져옵니다."""
     try:
-        ticker_data = yf.Ticker(ticker).info
+        ticker_data = get_info(ticker)
         return ticker_data
     except Exception as e:
         st.error(f"{ticker} 데이터를 불러오는 중 오류가 발생했습니다: {str(e)}")
@@ -1,16 +1,128 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import streamlit as st
 import os
+import asyncio
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
+from disk_cache import DiskCache, make_key
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OPENAI_BASE_URL을 지정하면 fake_openai.py 같은 로컬 엔드포인트로 요청을 보낼 수 있습니다.
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
 
+MODEL = "gpt-4o-mini"
+ETF_ANALYST_PROMPT = "You are a highly experienced ETF investment analyst with deep knowledge of global markets and various ETF strategies. Provide your responses in Korean, ensuring they are clear, concise, and tailored for both novice and experienced investors. Always consider current market conditions and potential future scenarios in your analysis."
+PORTFOLIO_ANALYST_PROMPT = "You are a highly experienced financial analyst specializing in ETF portfolio analysis. Provide your analysis in Korean, ensuring it is clear, concise, and tailored for both novice and experienced investors."
 
-def analyze_portfolio_gpt(portfolio_data, performance_metrics, risk_metrics):
-    """GPT를 사용하여 포트폴리오를 분석합니다."""
-    prompt = f"""
+PAYLOAD_TOKEN_BUDGET = int(os.getenv("GPT_PAYLOAD_TOKEN_BUDGET", 800))
+
+GPT_CACHE_TTL = int(os.getenv("GPT_CACHE_TTL", 24 * 60 * 60))
+_response_cache = DiskCache("gpt_responses", ttl=GPT_CACHE_TTL)
+
+
+def _response_key(model, system_prompt, prompt):
+    return make_key(model, system_prompt, prompt)
+
+def _messages(system_prompt, prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model(MODEL)
+except Exception:
+    _encoding = None
+
+def count_tokens(text):
+    """텍스트의 토큰 수를 셉니다. tiktoken이 없으면 4바이트당 1토큰으로 추정합니다."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return -(-len(text.encode('utf-8')) // 4)
+
+def _format_number(value):
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return "nan" if pd.isna(value) else f"{value:.4g}"
+    return str(value)
+
+def _price_payload(data, num_points):
+    """OHLCV 데이터를 핵심 통계와 균등 간격으로 줄인 종가 시계열로 요약합니다."""
+    prices = (data['Adj Close'] if 'Adj Close' in data else data['Close']).dropna()
+    if prices.empty:
+        return "no price data"
+    returns = prices.pct_change().dropna()
+    drawdown = prices / prices.cummax() - 1
+    stats = {
+        'period': f"{prices.index[0]:%Y-%m-%d}~{prices.index[-1]:%Y-%m-%d}",
+        'days': len(prices),
+        'start': prices.iloc[0],
+        'end': prices.iloc[-1],
+        'high': prices.max(),
+        'low': prices.min(),
+        'total_return': prices.iloc[-1] / prices.iloc[0] - 1,
+        'annual_return': returns.mean() * 252,
+        'annual_volatility': returns.std() * np.sqrt(252),
+        'max_drawdown': drawdown.min(),
+    }
+    lines = [", ".join(f"{key}={_format_number(value)}" for key, value in stats.items())]
+    positions = np.unique(np.linspace(0, len(prices) - 1, min(num_points, len(prices))).round().astype(int))
+    sampled = prices.iloc[positions]
+    lines.append("close: " + ", ".join(f"{date:%Y-%m-%d}:{_format_number(value)}" for date, value in sampled.items()))
+    return "\n".join(lines)
+
+def _correlation_payload(correlation, top_k, target=None):
+    """상관관계 행렬에서 대상과의 상관계수 중 절댓값 상위 top_k개만 남깁니다."""
+    target = correlation.columns[0] if target is None or target not in correlation else target
+    values = correlation[target].drop(target, errors='ignore').dropna()
+    values = values.reindex(values.abs().sort_values(ascending=False).index)[:top_k]
+    return f"correlation with {target}: " + ", ".join(f"{name}={value:.2f}" for name, value in values.items())
+
+def _payload_text(obj, size, target=None):
+    """분석 결과를 size(표본 수, 상위 개수, 행 수)에 맞춰 간결한 텍스트로 바꿉니다."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)) and obj.empty:
+        return "no data"
+    if isinstance(obj, pd.DataFrame):
+        if isinstance(obj.index, pd.DatetimeIndex) and ('Close' in obj or 'Adj Close' in obj):
+            return _price_payload(obj, size)
+        if obj.shape[0] == obj.shape[1] and list(obj.index) == list(obj.columns):
+            return _correlation_payload(obj, size, target)
+        return obj.head(size).to_csv(index=False, float_format='%.4g').strip()
+    if isinstance(obj, pd.Series):
+        values = obj.dropna()
+        values = values.reindex(values.abs().sort_values(ascending=False).index)[:size]
+        return ", ".join(f"{name}={_format_number(value)}" for name, value in values.items())
+    if isinstance(obj, dict):
+        return ", ".join(f"{key}={_format_number(value)}" for key, value in obj.items())
+    return str(obj)
+
+def build_prompt_payload(obj, token_budget=PAYLOAD_TOKEN_BUDGET, max_size=120, target=None):
+    """분석 결과를 token_budget 이내의 결정적인 요약 텍스트로 바꾸고 (텍스트, 토큰 수)를 반환합니다.
+
+    가격 데이터는 핵심 통계와 줄인 시계열, 상관관계 행렬은 대상과의 상위 상관계수, 표는 앞쪽 행만 남기며,
+    예산을 넘으면 표본 수를 절반씩 줄입니다.
+    """
+    size = max_size
+    while True:
+        text = _payload_text(obj, size, target)
+        tokens = count_tokens(text)
+        if tokens <= token_budget or size <= 1:
+            break
+        size //= 2
+    if tokens > token_budget:
+        # 줄일 수 없는 요약(예: 큰 딕셔너리)은 예산에 맞게 자릅니다.
+        text = text[:token_budget * 4]
+        tokens = count_tokens(text)
+        while tokens > token_budget:
+            text = text[:int(len(text) * token_budget / tokens)]
+            tokens = count_tokens(text)
+    return text, tokens
+
+def portfolio_prompt(portfolio_data, performance_metrics, risk_metrics):
+    """포트폴리오 분석 프롬프트를 만듭니다."""
+    return f"""
     Given the following portfolio data and metrics:
     
     Portfolio composition:
@@ -36,35 +148,97 @@ def analyze_portfolio_gpt(portfolio_data, performance_metrics, risk_metrics):
     
     Please structure your response in clear sections and provide specific, actionable advice.
     """
-    
+
+def analyze_portfolio_gpt(portfolio_data, performance_metrics, risk_metrics, stream=False):
+    """GPT를 사용하여 포트폴리오를 분석합니다."""
+    prompt = portfolio_prompt(portfolio_data, performance_metrics, risk_metrics)
+    if stream:
+        return stream_gpt_analysis(prompt, system_prompt=PORTFOLIO_ANALYST_PROMPT)
+    analysis = get_gpt_analysis(prompt, system_prompt=PORTFOLIO_ANALYST_PROMPT)
+    if analysis is None:
+        return "GPT 분석 중 오류가 발생했습니다. 나중에 다시 시도해 주세요."
+    return analysis
+
+def stream_gpt_analysis(prompt, system_prompt=ETF_ANALYST_PROMPT, model=MODEL):
+    """GPT 분석 결과를 토큰 단위로 내보내는 제너레이터입니다. 스트림이 끝나면 전체 텍스트를 캐시에 저장합니다.
+
+    요청이 실패하면(스트림 도중 포함) 예외를 그대로 전달하므로, 호출한 쪽은 이미 받은 부분이 완성된 답이 아님을 알 수 있습니다.
+    """
+    key = _response_key(model, system_prompt, prompt)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a highly experienced financial analyst specializing in ETF portfolio analysis. Provide your analysis in Korean, ensuring it is clear, concise, and tailored for both novice and experienced investors."},
-                {"role": "user", "content": prompt}
-            ]
+        stream = client.chat.completions.create(
+            model=model,
+            messages=_messages(system_prompt, prompt),
+            stream=True
         )
-        return response.choices[0].message.content
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
     except Exception as e:
-        print(f"Error in GPT analysis: {str(e)}")
-        return "GPT 분석 중 오류가 발생했습니다. 나중에 다시 시도해 주세요."
+        print(f"API call error: {str(e)}")
+        raise
+    _response_cache.set(key, "".join(parts))
+
+def get_gpt_analysis(prompt, system_prompt=ETF_ANALYST_PROMPT, model=MODEL, stream=False):
+    """GPT 분석 결과를 반환합니다. 같은 (모델, 시스템 프롬프트, 프롬프트)는 TTL 동안 캐시된 응답을 사용합니다.
 
-def get_gpt_analysis(prompt):
+    stream=True이면 토큰을 순서대로 내보내는 제너레이터를 반환합니다.
+    """
+    if stream:
+        return stream_gpt_analysis(prompt, system_prompt, model)
+    key = _response_key(model, system_prompt, prompt)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a highly experienced ETF investment analyst with deep knowledge of global markets and various ETF strategies. Provide your responses in Korean, ensuring they are clear, concise, and tailored for both novice and experienced investors. Always consider current market conditions and potential future scenarios in your analysis."},
-                {"role": "user", "content": prompt}
-            ]
+            model=model,
+            messages=_messages(system_prompt, prompt)
+        )
+        content = response.choices[0].message.content
+        _response_cache.set(key, content)
+        return content
+    except Exception as e:
+        print(f"API call error: {str(e)}")
+        return None
+
+async def get_gpt_analysis_async(async_client, prompt, system_prompt=ETF_ANALYST_PROMPT, model=MODEL):
+    """get_gpt_analysis의 비동기 버전입니다. async_client는 현재 이벤트 루프에서 만든 AsyncOpenAI 클라이언트입니다."""
+    key = _response_key(model, system_prompt, prompt)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        response = await async_client.chat.completions.create(
+            model=model,
+            messages=_messages(system_prompt, prompt)
         )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        _response_cache.set(key, content)
+        return content
     except Exception as e:
         print(f"API call error: {str(e)}")
         return None
 
-def analyze_financials_with_gpt(ticker, financial_data):
+def run_gpt_analyses(prompts, system_prompt=ETF_ANALYST_PROMPT, model=MODEL):
+    """{이름: 프롬프트} 딕셔너리의 프롬프트들을 동시에 요청하고 {이름: 분석 결과}를 반환합니다."""
+    _response_cache.evict_expired()
+
+    async def run_all():
+        # 비동기 클라이언트의 연결 풀은 만든 이벤트 루프에 묶이므로, asyncio.run마다 새로 만들고 끝나면 닫습니다.
+        async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL")) as async_client:
+            results = await asyncio.gather(*(get_gpt_analysis_async(async_client, prompt, system_prompt, model)
+                                             for prompt in prompts.values()))
+        return dict(zip(prompts.keys(), results))
+    return asyncio.run(run_all())
+
+def analyze_financials_with_gpt(ticker, financial_data, stream=False):
     """GPT를 사용하여 티커의 재무 정보를 분석합니다."""
     prompt = f"""
     Given the following financial data for {ticker}:
@@ -85,10 +259,11 @@ def analyze_financials_with_gpt(ticker, financial_data):
     4. Recommendations for an investor looking at this company in the current market environment.
     """
     
-    return get_gpt_analysis(prompt)
+    return get_gpt_analysis(prompt, stream=stream)
 
-def analyze_etf_performance(etf_data):
-    prompt = f"""
+def performance_prompt(etf_data):
+    """ETF 성과 분석 프롬프트를 만듭니다."""
+    return f"""
 Given the following ETF performance data: {etf_data}
 
 1. Analyze the ETF's performance based on this data.
@@ -97,10 +272,13 @@ Given the following ETF performance data: {etf_data}
 4. Provide 3 actionable insights that would be valuable for investors.
 5. Briefly comment on the outlook for this ETF considering the current market conditions.
 """
-    return get_gpt_analysis(prompt)
 
-def analyze_risk_and_benchmark(risk_data):
-    prompt = f"""
+def analyze_etf_performance(etf_data, stream=False):
+    return get_gpt_analysis(performance_prompt(etf_data), stream=stream)
+
+def risk_prompt(risk_data):
+    """리스크 및 벤치마크 분석 프롬프트를 만듭니다."""
+    return f"""
 Based on the following risk and benchmark analysis data for the ETF: {risk_data}
 
 1. Interpret this data and explain the key risk indicators (e.g., beta, maximum drawdown, tracking error).
@@ -109,10 +287,13 @@ Based on the following risk and benchmark analysis data for the ETF: {risk_data}
 4. Explain what type of investor this ETF's risk level is suitable for.
 5. Predict how this ETF's risk profile might change in the current market conditions.
 """
-    return get_gpt_analysis(prompt)
 
-def analyze_factor_exposure(factor_data):
-    prompt = f"""
+def analyze_risk_and_benchmark(risk_data, stream=False):
+    return get_gpt_analysis(risk_prompt(risk_data), stream=stream)
+
+def factor_prompt(factor_data):
+    """팩터 노출도 분석 프롬프트를 만듭니다."""
+    return f"""
     Given the following factor exposure analysis results for the ETF: {factor_data}
 
     1. Explain the exposure to each factor (market, size, value, growth, momentum, quality, low volatility, dividend, high yield, international, emerging markets) in detail.
@@ -122,10 +303,13 @@ def analyze_factor_exposure(factor_data):
     5. Considering this ETF's factor exposure, suggest what type of portfolio it would be suitable for.
     6. Discuss how this ETF's factor exposure compares to its peers or the broader market.
     """
-    return get_gpt_analysis(prompt)
 
-def compare_etfs(comparison_data):
-    prompt = f"""
+def analyze_factor_exposure(factor_data, stream=False):
+    return get_gpt_analysis(factor_prompt(factor_data), stream=stream)
+
+def comparison_prompt(comparison_data):
+    """ETF 비교 분석 프롬프트를 만듭니다."""
+    return f"""
 Based on the following comparison data for multiple ETFs: {comparison_data}
 
 1. Summarize the main characteristics, advantages, and disadvantages of each ETF concisely.
@@ -134,10 +318,13 @@ Based on the following comparison data for multiple ETFs: {comparison_data}
 4. Considering the current market conditions, provide your opinion on which ETF looks most promising.
 5. Evaluate the suitability of each ETF from both long-term and short-term investment perspectives.
 """
-    return get_gpt_analysis(prompt)
 
-def analyze_macro_correlation(correlation_data):
-    prompt = f"""
+def compare_etfs(comparison_data, stream=False):
+    return get_gpt_analysis(comparison_prompt(comparison_data), stream=stream)
+
+def macro_prompt(correlation_data):
+    """매크로 상관관계 분석 프롬프트를 만듭니다."""
+    return f"""
     Given the following correlation data between the ETF and macroeconomic indicators: {correlation_data}
 
     Please provide a comprehensive analysis in Korean, addressing the following points:
@@ -150,7 +337,9 @@ def analyze_macro_correlation(correlation_data):
     6. Suggest how this ETF might play a role in hedging macroeconomic risks in a portfolio.
     7. Discuss any limitations of this correlation-based analysis and suggest additional factors or data that could provide a more comprehensive understanding of the ETF's relationship with macroeconomic conditions.
     """
-    return get_gpt_analysis(prompt)
+
+def analyze_macro_correlation(correlation_data, stream=False):
+    return get_gpt_analysis(macro_prompt(correlation_data), stream=stream)
 
 def get_etf_recommendation(etf_data, risk_profile):
     prompt = f"""
@@ -176,4 +365,14 @@ And considering these market conditions: {market_conditions}
 4. Explain whether it's appropriate to include this ETF in a current portfolio and why.
 5. Advise on investment strategies or timing to maximize the performance of this ETF.
 """
-    return get_gpt_analysis(prompt)
\ No newline at end of file
+    return get_gpt_analysis(prompt)
+
+def analyze_all(etf_data, risk_data, factor_data, comparison_data, correlation_data):
+    """성과, 리스크, 팩터, 비교, 매크로 분석을 동시에 요청합니다."""
+    return run_gpt_analyses({
+        'performance': performance_prompt(etf_data),
+        'risk': risk_prompt(risk_data),
+        'factor': factor_prompt(factor_data),
+        'comparison': comparison_prompt(comparison_data),
+        'macro': macro_prompt(correlation_data),
+    })
\ No newline at end of file
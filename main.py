@@ -1,33 +1,47 @@
+import re
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import time
-from functools import lru_cache
 from data_loader import load_data
-from etf_analysis import analyze_etf, analyze_risk_and_benchmark, analyze_factor_exposure, compare_etfs, analyze_macro_market_correlation
-from gpt_analysis import analyze_etf_performance, analyze_risk_and_benchmark as gpt_analyze_risk, analyze_factor_exposure as gpt_analyze_factor, compare_etfs as gpt_compare_etfs, analyze_macro_correlation, get_etf_recommendation, predict_etf_performance, analyze_financials_with_gpt
+from price_store import DAILY, INTRADAY_LIMITS
+from etf_analysis import analyze_etf, analyze_risk_and_benchmark, analyze_factor_regression, compare_etfs, analyze_macro_market_correlation, analyze_rolling_risk, analyze_rolling_factor_exposure, analyze_rolling_macro_correlation
+from gpt_analysis import analyze_portfolio_gpt, analyze_etf_performance, analyze_risk_and_benchmark as gpt_analyze_risk, analyze_factor_exposure as gpt_analyze_factor, compare_etfs as gpt_compare_etfs, analyze_macro_correlation, get_etf_recommendation, predict_etf_performance, analyze_financials_with_gpt, analyze_all, build_prompt_payload, PAYLOAD_TOKEN_BUDGET
 
 from visualizations import (
     plot_price_performance, plot_risk_metrics, plot_factor_exposure, 
-    plot_etf_comparison, plot_macro_correlation,
-    plot_portfolio_summary, plot_cumulative_returns, plot_asset_allocation, plot_efficient_frontier
+    plot_etf_comparison, plot_macro_correlation, plot_rolling_metrics,
+    plot_portfolio_summary, plot_cumulative_returns, plot_asset_allocation, plot_efficient_frontier, plot_backtest
 )
-from portfolio_analysis import analyze_portfolio, calculate_portfolio_performance, analyze_risk, analyze_asset_allocation, optimize_portfolio
+from portfolio_analysis import load_portfolio_returns, load_market_returns, analyze_portfolio, calculate_portfolio_performance, analyze_risk, analyze_rolling_risk as analyze_portfolio_rolling_risk, analyze_holdings, analyze_var, backtest_portfolio, analyze_asset_allocation, get_asset_categories, optimize_portfolio
 from financial_dashboard import load_ticker_data, display_financial_info
+from rolling import ROLLING_WINDOWS
+from pipeline import ComputationGraph
+from walk_forward import walk_forward
+from ticker_info import get_info, prefetch_info
+from factor_model import INTERCEPT
+
+# 공분산 추정 방법: 화면 이름 -> covariance.COVARIANCE_METHODS
+COVARIANCE_LABELS = {"표본": "sample", "Ledoit-Wolf 축소": "ledoit_wolf", "EWMA": "ewma"}
+
+def get_etf_price(ticker):
+    # 재시도와 속도 제한은 요청 스케줄러의 작업 스레드에서 처리되므로 스크립트 스레드에서 sleep하지 않습니다.
+    try:
+        return get_info(ticker).get('regularMarketPreviousClose')
+    except Exception as e:
+        st.warning(f"ETF 정보를 가져오는 데 실패했습니다. 오류: {str(e)}")
+        return None
+
+def show_gpt_stream(stream):
+    """GPT 스트림을 출력하고, 끝까지 받은 경우에만 완료 메시지를 보여 줍니다."""
+    try:
+        st.write_stream(stream)
+    except Exception as e:
+        st.error(f"GPT 분석 중 오류가 발생했습니다. 위 내용은 완성되지 않은 응답일 수 있습니다. 오류: {str(e)}")
+    else:
+        st.success("GPT 분석 완료!")
 
-@lru_cache(maxsize=100)
-def get_etf_price(ticker, max_retries=3, cache_time=900):
-    for attempt in range(max_retries):
-        try:
-            etf_data = yf.Ticker(ticker)
-            current_price = etf_data.info.get('regularMarketPreviousClose')
-            if current_price is not None:
-                return current_price
-        except Exception as e:
-            if attempt == max_retries - 1:
-                st.warning(f"ETF 정보를 가져오는 데 실패했습니다. 오류: {str(e)}")
-        time.sleep(1)  # API 요청 사이에 잠시 대기
-    return None
+def has_all_tickers(returns, tickers, *_):
+    """요청한 티커의 수익률이 모두 있는지 확인합니다. 일부가 빠진 결과는 다음 재실행에서 다시 불러오도록 그래프에 알립니다."""
+    return all(ticker in returns for ticker in tickers)
 
 st.set_page_config(page_title="ETF 분석 및 포트폴리오 대시보드", layout="wide", initial_sidebar_state="expanded")
 
@@ -47,10 +61,7 @@ if dashboard_type == "티커 재무 정보":
 
     #GPT 분석 버튼 추가
     if st.button("GPT 재무 분석 실행", key="financial_gpt"):
-        with st.spinner("GPT 분석 중..."):
-            gpt_analysis = analyze_financials_with_gpt(ticker, ticker_data)
-        st.success("GPT 분석 완료!")
-        st.write(gpt_analysis)
+        show_gpt_stream(analyze_financials_with_gpt(ticker, ticker_data, stream=True))
 
 # 나머지 대시보드는 그대로 유지
 elif dashboard_type == "ETF 분석 대시보드":
@@ -62,10 +73,14 @@ elif dashboard_type == "ETF 분석 대시보드":
     start_date = st.sidebar.date_input("시작 날짜", value=pd.to_datetime("2024-01-01"))
     end_date = st.sidebar.date_input("종료 날짜", value=pd.Timestamp.today().date())
     benchmark_ticker = st.sidebar.text_input("벤치마크 티커 입력", value="^GSPC")
+    token_budget = st.sidebar.number_input("GPT 데이터 토큰 한도", min_value=100, max_value=8000, value=PAYLOAD_TOKEN_BUDGET, step=100)
+    rolling_window = st.sidebar.selectbox("롤링 창 (거래일)", ROLLING_WINDOWS, index=1)
+    # 분봉은 개요 차트에만 쓰고, 연간화 지표는 일봉으로 계산합니다.
+    price_interval = st.sidebar.selectbox("가격 차트 간격", [DAILY] + list(INTRADAY_LIMITS), index=0)
 
     @st.cache_data
-    def load_cached_data(ticker, start_date, end_date):
-        return load_data(ticker, start_date, end_date)
+    def load_cached_data(ticker, start_date, end_date, interval=DAILY):
+        return load_data(ticker, start_date, end_date, interval)
 
     # 데이터 로드 및 기본 분석
     data = load_cached_data(ticker, start_date, end_date)
@@ -81,7 +96,14 @@ elif dashboard_type == "ETF 분석 대시보드":
         st.header("ETF 개요")
         col1, col2 = st.columns([2, 1])
         with col1:
-            plot_price_performance(data, ticker)
+            if price_interval == DAILY:
+                plot_price_performance(data, ticker)
+            else:
+                lookback_days = INTRADAY_LIMITS[price_interval][0]
+                st.caption(f"{price_interval} 분봉은 최근 {lookback_days}일까지만 제공됩니다.")
+                intraday_data = load_cached_data(ticker, start_date, end_date + pd.Timedelta(days=1), price_interval)
+                if intraday_data is not None:
+                    plot_price_performance(intraday_data, ticker)
         with col2:
             etf_info = analyze_etf(data, ticker)
             for key, value in etf_info.items():
@@ -98,32 +120,39 @@ elif dashboard_type == "ETF 분석 대시보드":
             st.metric("샤프 비율", performance_metrics["샤프 비율"])
         
         if st.button("GPT 성과 분석 실행", key="performance_gpt"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = analyze_etf_performance(str(data))
-            st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+            payload, payload_tokens = build_prompt_payload(data, token_budget)
+            st.caption(f"전송할 데이터 토큰 수: {payload_tokens}")
+            show_gpt_stream(analyze_etf_performance(payload, stream=True))
 
     with tab3:
         st.header("리스크 분석")
         risk_metrics = analyze_risk_and_benchmark(data, benchmark_data, ticker, benchmark_ticker)
         plot_risk_metrics(risk_metrics, ticker, benchmark_ticker)
+        rolling_risk = analyze_rolling_risk(ticker, benchmark_ticker, start_date, end_date, rolling_window)
+        plot_rolling_metrics(rolling_risk, f"{ticker} {rolling_window}일 롤링 리스크 지표")
         
         if st.button("GPT 리스크 분석 실행", key="risk_gpt"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = gpt_analyze_risk(str(risk_metrics))
-            st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+            payload, payload_tokens = build_prompt_payload(risk_metrics, token_budget)
+            st.caption(f"전송할 데이터 토큰 수: {payload_tokens}")
+            show_gpt_stream(gpt_analyze_risk(payload, stream=True))
 
     with tab4:
         st.header("팩터 분석")
-        factor_exposure = analyze_factor_exposure(ticker, start_date, end_date)
+        # IWD, IWF, ^GSPC, QUAL 등 팩터끼리 상관이 높으므로 리지 벌점으로 노출도를 안정시킬 수 있습니다.
+        ridge = st.slider("리지 벌점 (팩터 평균 분산 대비)", min_value=0.0, max_value=1.0, value=0.0, step=0.05)
+        factor_regression, factor_r2 = analyze_factor_regression(ticker, start_date, end_date, ridge)
+        factor_exposure = factor_regression['Coefficient'].drop(INTERCEPT) if not factor_regression.empty else pd.Series()
         plot_factor_exposure(factor_exposure)
+        if not factor_regression.empty:
+            st.dataframe(factor_regression)
+            st.caption(f"결정계수(R²): {factor_r2:.3f}")
+        rolling_exposure = analyze_rolling_factor_exposure(ticker, start_date, end_date, rolling_window, ridge)
+        plot_rolling_metrics(rolling_exposure, f"{rolling_window}일 롤링 팩터 노출도")
         
         if st.button("GPT 팩터 분석 실행", key="factor_gpt"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = gpt_analyze_factor(str(factor_exposure))
-            st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+            payload, payload_tokens = build_prompt_payload(factor_exposure, token_budget)
+            st.caption(f"전송할 데이터 토큰 수: {payload_tokens}")
+            show_gpt_stream(gpt_analyze_factor(payload, stream=True))
 
     with tab5:
         st.header("ETF 비교")
@@ -132,21 +161,49 @@ elif dashboard_type == "ETF 분석 대시보드":
         plot_etf_comparison(comparison_data)
         
         if st.button("GPT ETF 비교 분석 실행", key="compare_gpt"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = gpt_compare_etfs(str(comparison_data))
-            st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+            payload, payload_tokens = build_prompt_payload(comparison_data, token_budget)
+            st.caption(f"전송할 데이터 토큰 수: {payload_tokens}")
+            show_gpt_stream(gpt_compare_etfs(payload, stream=True))
 
     with tab6:
         st.header("매크로 분석")
-        correlation_data = analyze_macro_market_correlation(ticker, start_date, end_date)
+        with st.expander("비교 시계열 확장"):
+            universe_text = st.text_area("추가 티커 (쉼표, 공백 또는 줄바꿈으로 구분)", value="")
+            col1, col2 = st.columns(2)
+            macro_top_k = col1.number_input("상관계수 상위 개수 (0: 전체)", min_value=0, max_value=200, value=30, step=5)
+            macro_cluster = col2.checkbox("계층적 군집 순서로 정렬", value=True)
+        macro_universe = tuple(dict.fromkeys(t for t in re.split(r"[\s,]+", universe_text.upper()) if t))
+        correlation_data = analyze_macro_market_correlation(ticker, start_date, end_date, macro_universe,
+                                                            int(macro_top_k) or None, macro_cluster)
         plot_macro_correlation(correlation_data, ticker)
+        rolling_correlation = analyze_rolling_macro_correlation(ticker, start_date, end_date, rolling_window)
+        plot_rolling_metrics(rolling_correlation, f"{ticker}와 매크로 지표 간 {rolling_window}일 롤링 상관관계")
         
         if st.button("GPT 매크로 분석 실행", key="macro_gpt"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = analyze_macro_correlation(str(correlation_data))
+            payload, payload_tokens = build_prompt_payload(correlation_data, token_budget, target=ticker)
+            st.caption(f"전송할 데이터 토큰 수: {payload_tokens}")
+            show_gpt_stream(analyze_macro_correlation(payload, stream=True))
+
+    st.write("---")
+    if st.button("전체 GPT 분석 실행", key="all_gpt"):
+        payloads = [
+            build_prompt_payload(data, token_budget),
+            build_prompt_payload(risk_metrics, token_budget),
+            build_prompt_payload(factor_exposure, token_budget),
+            build_prompt_payload(comparison_data, token_budget),
+            build_prompt_payload(correlation_data, token_budget, target=ticker),
+        ]
+        st.caption(f"전송할 데이터 토큰 수: {sum(tokens for _, tokens in payloads)}")
+        with st.spinner("GPT 분석 중..."):
+            gpt_results = analyze_all(*(payload for payload, _ in payloads))
+        failed = [key for key, result in gpt_results.items() if result is None]
+        if failed:
+            st.error(f"일부 GPT 분석에 실패했습니다: {', '.join(failed)}")
+        else:
             st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+        for title, key in [("성과 분석", "performance"), ("리스크 분석", "risk"), ("팩터 분석", "factor"), ("ETF 비교", "comparison"), ("매크로 분석", "macro")]:
+            with st.expander(title, expanded=True):
+                st.write(gpt_results[key] if gpt_results[key] is not None else "GPT 분석 중 오류가 발생했습니다. 나중에 다시 시도해 주세요.")
 
 else:
     # ETF 포트폴리오 분석 대시보드 코드
@@ -233,60 +290,207 @@ else:
         st.session_state.portfolio['Weight'] = st.session_state.portfolio['Value'] / st.session_state.portfolio['Value'].sum()
 
     if not st.session_state.portfolio.empty:
-        # 데이터 준비
-        end_date = pd.Timestamp.now()
+        # 데이터 준비 (종료일을 날짜 단위로 맞춰야 재실행마다 기간이 바뀌지 않습니다)
+        end_date = pd.Timestamp.today().normalize()
         start_date = end_date - pd.DateOffset(years=5)
-        
-        # 포트폴리오 분석
-        portfolio_data = analyze_portfolio(st.session_state.portfolio, start_date, end_date)
-        performance_metrics = calculate_portfolio_performance(portfolio_data)
-        risk_metrics = analyze_risk(portfolio_data)
-        asset_allocation = analyze_asset_allocation(st.session_state.portfolio)
 
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "포트폴리오 개요", "성과 분석", "리스크 분석", "자산 배분", "개별 ETF 분석", "최적화 제안"
-        ])
-
-        with tab1:
+        # 포트폴리오 분석 그래프: 노드는 요청될 때만 계산되고, 입력(보유 종목, 비중, 기간)이 바뀐 노드만 다시 계산됩니다.
+        if 'portfolio_graph' not in st.session_state:
+            st.session_state.portfolio_graph = ComputationGraph()
+        graph = st.session_state.portfolio_graph
+        graph.start_run()
+        graph.set_input('holdings', st.session_state.portfolio[['ETF', 'Weight']].reset_index(drop=True))
+        graph.set_input('tickers', tuple(st.session_state.portfolio['ETF']))
+        graph.set_input('start_date', start_date)
+        graph.set_input('end_date', end_date)
+        # 수익률은 티커와 기간에만 의존하므로, Shares/Price 수정(비중 변경)은 수익률 행렬을 다시 불러오지 않습니다.
+        # 일부 ETF를 가져오지 못한 결과는 이번 실행에서만 쓰고 다음 재실행에서 다시 시도합니다.
+        graph.add_node('returns', load_portfolio_returns, ['tickers', 'start_date', 'end_date'], complete=has_all_tickers)
+        graph.add_node('portfolio_data', lambda holdings, returns: analyze_portfolio(holdings, returns=returns), ['holdings', 'returns'])
+        graph.add_node('performance_metrics', calculate_portfolio_performance, ['portfolio_data'])
+        # 시장 수익률도 사이드바 기간으로 한 번만 불러 리스크, 보유 종목, 롤링 지표가 함께 씁니다.
+        graph.add_node('market_returns', load_market_returns, ['start_date', 'end_date'])
+        graph.add_node('risk_metrics', analyze_risk, ['portfolio_data', 'market_returns'])
+        graph.add_node('asset_categories', lambda tickers: get_asset_categories(list(tickers)), ['tickers'])
+        graph.add_node('asset_allocation', analyze_asset_allocation, ['holdings', 'asset_categories'])
+        graph.add_node('holdings_metrics', analyze_holdings, ['portfolio_data', 'market_returns'])
+
+        missing_etfs = [etf for etf in st.session_state.portfolio['ETF'] if etf not in graph.get('portfolio_data')]
+        if missing_etfs:
+            st.warning(f"가격 데이터를 가져오지 못한 ETF는 분석에서 제외됩니다: {', '.join(missing_etfs)}")
+
+        # st.tabs는 모든 탭을 매번 실행하므로, 선택한 화면만 실행되도록 가로 라디오로 전환합니다.
+        section = st.radio("화면 선택", [
+            "포트폴리오 개요", "성과 분석", "리스크 분석", "자산 배분", "개별 ETF 분석", "리밸런싱 백테스트", "최적화 제안"
+        ], horizontal=True, label_visibility="collapsed")
+
+        if section == "포트폴리오 개요":
             st.header("포트폴리오 개요")
-            plot_portfolio_summary(portfolio_data, performance_metrics)
+            plot_portfolio_summary(graph.get('portfolio_data'), graph.get('performance_metrics'))
 
-        with tab2:
+        elif section == "성과 분석":
             st.header("성과 분석")
+            performance_metrics = graph.get('performance_metrics')
             st.write("연간 수익률: {:.2f}%".format(performance_metrics['Annual Return'] * 100))
             st.write("연간 변동성: {:.2f}%".format(performance_metrics['Annual Volatility'] * 100))
             st.write("샤프 비율: {:.2f}".format(performance_metrics['Sharpe Ratio']))
-            plot_cumulative_returns(portfolio_data)
+            plot_cumulative_returns(graph.get('portfolio_data'))
 
-        with tab3:
+        elif section == "리스크 분석":
             st.header("리스크 분석")
+            risk_metrics = graph.get('risk_metrics')
             st.write("베타: {:.4f}".format(risk_metrics['Beta']))
             st.write("알파: {:.2f}%".format(risk_metrics['Alpha'] * 100))
             st.write("최대 낙폭: {:.2f}%".format(risk_metrics['Max Drawdown'] * 100))
             st.write("Value at Risk (95%): {:.2f}%".format(risk_metrics['Value at Risk (95%)'] * 100))
-
-        with tab4:
+            rolling_window = st.selectbox("롤링 창 (거래일)", ROLLING_WINDOWS, index=1)
+            graph.set_input('rolling_window', rolling_window)
+            graph.add_node('rolling_risk', analyze_portfolio_rolling_risk, ['portfolio_data', 'rolling_window', 'market_returns'])
+            plot_rolling_metrics(graph.get('rolling_risk'), f"{rolling_window}일 롤링 리스크 지표")
+
+            st.subheader("VaR / CVaR 시뮬레이션")
+            col1, col2 = st.columns(2)
+            var_scenarios = col1.selectbox("시뮬레이션 시나리오 수", [10000, 100000, 1000000], index=1)
+            var_covariance = col2.selectbox("공분산 추정", list(COVARIANCE_LABELS), index=0, key="var_covariance")
+            graph.set_input('var_options', {'num_scenarios': var_scenarios, 'covariance_method': COVARIANCE_LABELS[var_covariance]})
+            graph.add_node('var_table', lambda portfolio_data, options: analyze_var(portfolio_data, **options),
+                           ['portfolio_data', 'var_options'])
+            st.dataframe(graph.get('var_table').style.format("{:.2%}"))
+            st.caption("보유 기간(거래일)별 수익률의 하위 분위수(VaR)와 그 이하 수익률의 평균(CVaR)입니다.")
+
+        elif section == "자산 배분":
             st.header("자산 배분")
-            plot_asset_allocation(asset_allocation)
+            plot_asset_allocation(graph.get('asset_allocation'))
 
-        with tab5:
+        elif section == "개별 ETF 분석":
             st.header("개별 ETF 분석")
+            st.dataframe(graph.get('holdings_metrics'))
+            etf_infos = prefetch_info(st.session_state.portfolio['ETF'])
             for etf in st.session_state.portfolio['ETF']:
                 with st.expander(f"{etf} 상세 정보"):
-                    etf_data = yf.Ticker(etf).info
-                    st.write(etf_data)
-
-        with tab6:
+                    st.write(etf_infos.get(etf, {}))
+
+        elif section == "리밸런싱 백테스트":
+            st.header("리밸런싱 백테스트")
+            rebalance_rules = {
+                "리밸런싱 없음": {},
+                "매일": {'frequency': 'daily'},
+                "매주": {'frequency': 'weekly'},
+                "매월": {'frequency': 'monthly'},
+                "분기별": {'frequency': 'quarterly'},
+                "매년": {'frequency': 'annual'},
+                "비중 이탈 5%": {'threshold': 0.05},
+                "비중 이탈 10%": {'threshold': 0.10},
+            }
+            selected_rules = st.multiselect("리밸런싱 규칙", list(rebalance_rules), default=["리밸런싱 없음", "매일", "매월", "비중 이탈 5%"])
+            col1, col2, col3 = st.columns(3)
+            cost_bps = col1.number_input("거래 비용 (bp)", min_value=0.0, max_value=100.0, value=10.0, step=1.0)
+            cash_weight = col2.slider("현금 비중", min_value=0.0, max_value=0.5, value=0.0, step=0.05)
+            cash_rate = col3.number_input("현금 연 이자율 (%)", min_value=0.0, max_value=10.0, value=2.0, step=0.25)
+
+            if selected_rules:
+                graph.set_input('backtest_options', {
+                    'rules': {name: rebalance_rules[name] for name in selected_rules},
+                    'cost': cost_bps / 10000,
+                    'cash_weight': cash_weight,
+                    'cash_rate': cash_rate / 100,
+                })
+                graph.add_node('backtest', lambda holdings, returns, options: backtest_portfolio(holdings, returns, **options),
+                               ['holdings', 'returns', 'backtest_options'])
+                backtest_summary, backtest_values = graph.get('backtest')
+                plot_backtest(backtest_values)
+                st.dataframe(backtest_summary.style.format({
+                    'Annual Return': "{:.2%}", 'Volatility': "{:.2%}", 'Sharpe Ratio': "{:.2f}",
+                    'Max Drawdown': "{:.2%}", 'Turnover': "{:.2f}", 'Cost': "{:.2%}",
+                }))
+                st.caption("회전율은 연 평균 편도 회전율, 비용은 기간 전체의 누적 거래 비용 비율입니다.")
+
+        elif section == "최적화 제안":
             st.header("포트폴리오 최적화 제안")
-            efficient_frontier, optimal_portfolio = optimize_portfolio(portfolio_data)
+            frontier_mode = st.radio("프론티어 계산 방식", ["무작위 표본", "정확한 프론티어"], horizontal=True)
+            num_portfolios = 10000
+            if frontier_mode == "무작위 표본":
+                num_portfolios = st.select_slider("표본 포트폴리오 수", options=[10000, 100000, 1000000], value=10000)
+
+            with st.expander("제약 조건"):
+                max_weight = st.slider("종목별 최대 비중", min_value=0.05, max_value=1.0, value=1.0, step=0.05)
+                group_cap = st.slider("카테고리별 최대 비중", min_value=0.05, max_value=1.0, value=1.0, step=0.05)
+                max_turnover = st.slider("최대 회전율 (현재 비중 대비)", min_value=0.0, max_value=2.0, value=2.0, step=0.05)
+                covariance_label = st.selectbox("공분산 추정", list(COVARIANCE_LABELS), index=0, key="optimization_covariance")
+
+            graph.set_input('optimization_options', {
+                'num_portfolios': num_portfolios,
+                'frontier': 'sampling' if frontier_mode == "무작위 표본" else 'exact',
+                'max_weight': max_weight,
+                'group_cap': group_cap,
+                'max_turnover': max_turnover,
+                'covariance_method': COVARIANCE_LABELS[covariance_label],
+            })
+
+            @graph.node('optimization', ['portfolio_data', 'asset_categories', 'optimization_options'])
+            def run_optimization(portfolio_data, asset_categories, options):
+                # 이전 최적 비중에서 다시 시작하면 작은 수정 후 재최적화가 바로 수렴합니다 (시작점은 캐시 키에 넣지 않습니다).
+                return optimize_portfolio(
+                    portfolio_data,
+                    num_portfolios=options['num_portfolios'],
+                    frontier=options['frontier'],
+                    initial_weights=st.session_state.get('optimal_weights'),
+                    max_weight=options['max_weight'],
+                    asset_categories=asset_categories,
+                    group_caps={category: options['group_cap'] for category in set(asset_categories.values())} if options['group_cap'] < 1.0 else None,
+                    max_turnover=options['max_turnover'] if options['max_turnover'] < 2.0 else None,
+                    covariance_method=options['covariance_method'],
+                )
+
+            efficient_frontier, optimal_portfolio = graph.get('optimization')
+            if optimal_portfolio.success:
+                st.session_state.optimal_weights = dict(zip(optimal_portfolio.tickers, optimal_portfolio.x))
+            else:
+                st.warning(f"최적화가 수렴하지 않았습니다: {optimal_portfolio.message}")
             plot_efficient_frontier(efficient_frontier, optimal_portfolio)
+            st.dataframe(pd.DataFrame({'ETF': optimal_portfolio.tickers, 'Weight': optimal_portfolio.x}), hide_index=True)
+
+            st.subheader("워크포워드 검증")
+            st.caption("매월 직전 학습 기간으로 다시 최적화하고 다음 달 성과를 표본 외로 평가합니다.")
+            col1, col2, col3 = st.columns(3)
+            walk_forward_years = col1.slider("검증 기간 (년)", min_value=5, max_value=30, value=10)
+            train_months = col2.selectbox("학습 기간 (개월)", [12, 24, 36, 60], index=2)
+            walk_forward_cost = col3.number_input("거래 비용 (bp)", min_value=0.0, max_value=100.0, value=10.0, step=1.0, key="walk_forward_cost")
+            if st.checkbox("워크포워드 검증 실행"):
+                graph.set_input('walk_forward_years', walk_forward_years)
+                graph.set_input('walk_forward_options', {
+                    'train_periods': train_months,
+                    'cost': walk_forward_cost / 10000,
+                    'max_weight': max_weight if max_weight < 1.0 else None,
+                })
+                graph.add_node('walk_forward_returns', lambda tickers, end, years: load_portfolio_returns(tickers, end - pd.DateOffset(years=years), end),
+                               ['tickers', 'end_date', 'walk_forward_years'], complete=has_all_tickers)
+
+                @graph.node('walk_forward', ['walk_forward_returns', 'holdings', 'walk_forward_options'])
+                def run_walk_forward(returns, holdings, options):
+                    weights = holdings.set_index('ETF')['Weight'].reindex(returns.columns).fillna(0).to_numpy()
+                    return walk_forward(returns, weights, **options)
+
+                try:
+                    walk_forward_result = graph.get('walk_forward')
+                except ValueError as e:
+                    st.warning(str(e))
+                else:
+                    timing = walk_forward_result['Timing']
+                    st.write("학습 창 {}개, 공분산 {:.2f}초, 최적화 {:.2f}초, 백테스트 {:.2f}초".format(
+                        timing['Windows'], timing['Covariance'], timing['Optimization'], timing['Backtest']))
+                    plot_backtest(walk_forward_result['Values'])
+                    st.dataframe(walk_forward_result['Summary'].style.format({
+                        'Annual Return': "{:.2%}", 'Volatility': "{:.2%}", 'Sharpe Ratio': "{:.2f}",
+                        'Max Drawdown': "{:.2%}", 'Turnover': "{:.2f}", 'Cost': "{:.2%}",
+                    }))
+                    plot_rolling_metrics(walk_forward_result['Weights'], "워크포워드 최적 비중")
 
         # GPT 분석
         if st.button("GPT 포트폴리오 분석 실행"):
-            with st.spinner("GPT 분석 중..."):
-                gpt_analysis = analyze_portfolio_gpt(portfolio_data, performance_metrics, risk_metrics)
-            st.success("GPT 분석 완료!")
-            st.write(gpt_analysis)
+            show_gpt_stream(analyze_portfolio_gpt(
+                graph.get('portfolio_data'), graph.get('performance_metrics'), graph.get('risk_metrics'), stream=True
+            ))
 
     else:
         st.info("포트폴리오를 구성하려면 사이드바에서 ETF를 추가하세요.")
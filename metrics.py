@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+RISK_FREE_RATE = 0.02
+TRADING_DAYS = 252
+BLOCK_SIZE = 512
+
+METRIC_COLUMNS = ["Annual Return", "Volatility", "Sharpe Ratio", "Beta", "Alpha", "Max Drawdown", "Tracking Error"]
+
+
+def _masked_mean(values, mask, count):
+    return np.where(mask, values, 0).sum(axis=0) / count
+
+
+def _block_metrics(returns, benchmark, daily_risk_free):
+    """(날짜 x 티커) 블록 하나의 지표를 계산합니다. NaN은 열마다 관측치가 없는 날로 취급합니다."""
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=0).astype(float)
+    mean = _masked_mean(returns, valid, count)
+    demeaned = np.where(valid, returns - mean, 0)
+    std = np.sqrt((demeaned ** 2).sum(axis=0) / (count - 1))
+
+    # 관측치가 없는 날은 수익률 0으로 두면 누적 수익률이 그대로 유지되어 낙폭 계산에 영향을 주지 않습니다.
+    cum_returns = np.cumprod(1 + np.where(valid, returns, 0), axis=0)
+    running_max = np.maximum.accumulate(cum_returns, axis=0)
+    max_drawdown = ((cum_returns - running_max) / running_max).min(axis=0, initial=0)
+
+    result = {
+        "Annual Return": mean * TRADING_DAYS,
+        "Volatility": std * np.sqrt(TRADING_DAYS),
+        "Sharpe Ratio": (mean - daily_risk_free) / std * np.sqrt(TRADING_DAYS),
+        "Max Drawdown": np.where(count > 0, max_drawdown, np.nan),
+    }
+    if benchmark is None:
+        return result
+
+    benchmark_valid = ~np.isnan(benchmark)
+    benchmark_mean = benchmark[benchmark_valid].mean()
+    benchmark_var = benchmark[benchmark_valid].var(ddof=1)
+
+    # 베타와 추적 오차는 티커와 벤치마크가 모두 있는 날짜만 사용합니다.
+    pair = valid & benchmark_valid[:, None]
+    pair_count = pair.sum(axis=0).astype(float)
+    bench = benchmark[:, None]
+    pair_mean = _masked_mean(returns, pair, pair_count)
+    pair_bench_mean = _masked_mean(np.broadcast_to(bench, returns.shape), pair, pair_count)
+    covariance = np.where(pair, (returns - pair_mean) * (bench - pair_bench_mean), 0).sum(axis=0) / (pair_count - 1)
+    beta = covariance / benchmark_var
+
+    active = returns - bench
+    active_mean = _masked_mean(active, pair, pair_count)
+    tracking_error = np.sqrt(np.where(pair, (active - active_mean) ** 2, 0).sum(axis=0) / (pair_count - 1))
+
+    result["Beta"] = beta
+    result["Alpha"] = ((mean - daily_risk_free) - beta * (benchmark_mean - daily_risk_free)) * TRADING_DAYS
+    result["Tracking Error"] = tracking_error * np.sqrt(TRADING_DAYS)
+    return result
+
+
+def cross_sectional_metrics(returns, benchmark=None, risk_free_rate=RISK_FREE_RATE, block_size=BLOCK_SIZE):
+    """(날짜 x 티커) 2차원 수익률 배열의 모든 열에 대해 연간 수익률, 변동성, 샤프 비율, 최대 낙폭과
+    벤치마크(길이가 날짜 수인 1차원 배열) 대비 베타, 알파, 추적 오차를 한 번의 벡터 연산으로 계산합니다.
+
+    상장일이 달라 생긴 NaN은 열마다 건너뛰며, 메모리를 제한하기 위해 열을 block_size개씩 나누어 계산합니다.
+    {지표 이름: 길이가 티커 수인 배열} 딕셔너리를 반환합니다.
+    """
+    returns = np.asarray(returns, dtype=float)
+    if returns.ndim == 1:
+        returns = returns[:, None]
+    if benchmark is not None:
+        benchmark = np.asarray(benchmark, dtype=float)
+    daily_risk_free = risk_free_rate / TRADING_DAYS
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        blocks = [
+            _block_metrics(returns[:, start:start + block_size], benchmark, daily_risk_free)
+            for start in range(0, returns.shape[1], block_size)
+        ]
+    if not blocks:
+        return {}
+    return {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+
+
+def metrics_frame(returns, benchmark_returns=None, risk_free_rate=RISK_FREE_RATE):
+    """수익률 DataFrame(열=티커)의 지표를 티커별 행으로 정리한 DataFrame으로 반환합니다."""
+    if benchmark_returns is not None:
+        index = returns.index.union(benchmark_returns.dropna().index)
+        returns = returns.reindex(index)
+        benchmark_returns = benchmark_returns.reindex(index).to_numpy()
+    metrics = cross_sectional_metrics(returns.to_numpy(), benchmark_returns, risk_free_rate)
+    columns = [name for name in METRIC_COLUMNS if name in metrics]
+    return pd.DataFrame({name: metrics[name] for name in columns}, index=returns.columns)
+
+
+def compute_risk_metrics(returns, benchmark_returns, risk_free_rate=RISK_FREE_RATE):
+    """일간 수익률과 벤치마크 수익률로 수익률, 변동성, 샤프 비율, 베타, 알파, 최대 낙폭, 추적 오차를 계산합니다."""
+    frame = metrics_frame(returns.dropna().to_frame("returns"), benchmark_returns.dropna(), risk_free_rate)
+    return frame.loc["returns"].to_dict()
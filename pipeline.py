@@ -0,0 +1,82 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+def fingerprint(value):
+    """입력 값의 내용으로 결정되는 해시 문자열을 반환합니다."""
+    digest = hashlib.sha1()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(repr(sorted((repr(k), fingerprint(v)) for k, v in value.items())).encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(repr([fingerprint(item) for item in value]).encode())
+    else:
+        digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class ComputationGraph:
+    """입력과 계산 노드의 의존 관계를 기록하고, 입력이 바뀐 노드만 다시 계산하는 메모이제이션 그래프입니다.
+
+    노드의 키는 의존하는 입력과 노드 키들의 해시이므로 결과 값을 해시하지 않아도 변경 여부를 알 수 있습니다.
+    노드는 get()으로 요청될 때만 계산되며, 같은 이름으로 다시 등록하면 함수만 바뀌고 캐시된 값은 유지됩니다.
+    complete(값, *의존 값)가 거짓인 결과(일부 다운로드 실패 등)는 start_run()으로 다음 실행이 시작될 때까지만 재사용되고,
+    그 결과에 의존하는 노드도 함께 다시 계산됩니다.
+    """
+
+    def __init__(self):
+        self._inputs = {}
+        self._nodes = {}
+        self._values = {}
+        self._incomplete = set()
+        self._run = 0
+
+    def start_run(self):
+        """새 실행(Streamlit 재실행)을 시작합니다. 이전 실행의 불완전한 결과는 다시 계산됩니다."""
+        self._run += 1
+
+    def set_input(self, name, value):
+        self._inputs[name] = (fingerprint(value), value)
+
+    def add_node(self, name, func, deps=(), complete=None):
+        self._nodes[name] = (func, tuple(deps), complete)
+
+    def node(self, name, deps=(), complete=None):
+        """함수를 노드로 등록하는 데코레이터입니다."""
+        def register(func):
+            self.add_node(name, func, deps, complete)
+            return func
+        return register
+
+    def key(self, name):
+        if name in self._inputs:
+            return self._inputs[name][0]
+        _, deps, _ = self._nodes[name]
+        key = fingerprint((name,) + tuple(self.key(dep) for dep in deps))
+        # 불완전한 결과의 키에는 실행 번호를 넣어, 다음 실행에서 이 노드와 의존 노드의 키가 모두 바뀌게 합니다.
+        return fingerprint((key, self._run)) if name in self._incomplete else key
+
+    def get(self, name):
+        """노드 값을 반환합니다. 의존하는 입력이 바뀐 경우에만 (필요한 의존 노드와 함께) 다시 계산합니다."""
+        if name in self._inputs:
+            return self._inputs[name][1]
+        key = self.key(name)
+        cached = self._values.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        func, deps, complete = self._nodes[name]
+        args = [self.get(dep) for dep in deps]
+        value = func(*args)
+        if complete is None or complete(value, *args):
+            self._incomplete.discard(name)
+        else:
+            self._incomplete.add(name)
+        # 의존 노드의 완전성이 방금 바뀌었을 수 있으므로 키를 다시 계산해 저장합니다.
+        self._values[name] = (self.key(name), value)
+        return value
@@ -1,112 +1,308 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from scipy.optimize import minimize
+from data_loader import load_returns, load_return_series
+from metrics import cross_sectional_metrics, metrics_frame
+from rolling import RollingMetrics
+from backtest import sweep, summarize
+from covariance import covariance
+from risk_simulation import CONFIDENCE_LEVELS, HORIZONS, NUM_SCENARIOS, value_at_risk
+from ticker_info import prefetch_info
 
-def analyze_portfolio(portfolio_df, start_date, end_date):
-    """포트폴리오 데이터를 분석하고 각 ETF의 수익률 데이터를 반환합니다."""
+MARKET_TICKER = '^GSPC'
+
+def load_portfolio_returns(tickers, start_date, end_date):
+    """보유 ETF의 일간 수익률을 (날짜 x ETF) DataFrame으로 반환합니다.
+
+    수익률은 비중과 무관하므로 Shares나 Price만 바뀐 경우에는 다시 부를 필요가 없고, 티커별 수익률은 프로세스 전역 캐시를 거치므로
+    새로 추가된 티커만 내려받습니다.
+    """
+    return load_returns(list(tickers), start_date, end_date)
+
+def load_market_returns(start_date, end_date):
+    """시장 벤치마크(S&P 500)의 일간 수익률입니다. ETF 분석과 같은 기간, 같은 컬럼으로 불러 수익률 캐시의 같은 항목을 씁니다."""
+    return load_return_series(MARKET_TICKER, start_date, end_date)
+
+def _market_returns(index, market_returns):
+    # market_returns가 없으면(스크립트 등) 수익률 기간으로 불러옵니다.
+    return load_return_series(MARKET_TICKER, index[0], index[-1]) if market_returns is None else market_returns
+
+def analyze_portfolio(portfolio_df, start_date=None, end_date=None, returns=None):
+    """포트폴리오 데이터를 분석하고 각 ETF의 수익률 데이터를 반환합니다.
+
+    returns(load_portfolio_returns의 결과)를 넘기면 가격을 다시 불러오지 않고 portfolio_df의 비중만 반영합니다.
+    """
     portfolio_data = {}
-    for etf, weight in portfolio_df[['ETF', 'Weight']].values:
+    if returns is None:
         try:
-            data = yf.download(etf, start=start_date, end=end_date)['Adj Close']
-            returns = data.pct_change().dropna()
-            portfolio_data[etf] = {'returns': returns, 'weight': weight}
+            returns = load_portfolio_returns(portfolio_df['ETF'], start_date, end_date)
         except Exception as e:
-            print(f"Error fetching data for {etf}: {e}")
+            print(f"Error fetching portfolio data: {e}")
+            return portfolio_data
+    for etf, weight in portfolio_df[['ETF', 'Weight']].values:
+        if etf in returns:
+            portfolio_data[etf] = {'returns': returns[etf].dropna(), 'weight': weight}
+        else:
+            print(f"Error fetching data for {etf}: no price data")
     return portfolio_data
 
+def weighted_returns(portfolio_data):
+    """ETF 수익률 행렬과 비중 벡터의 곱으로 포트폴리오 일간 수익률을 계산합니다. 관측치가 없는 날의 수익률은 0으로 봅니다."""
+    weights = np.array([data['weight'] for data in portfolio_data.values()], dtype=float)
+    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
+    return pd.Series(returns.fillna(0).to_numpy() @ weights, index=returns.index)
+
 def calculate_portfolio_performance(portfolio_data):
     """포트폴리오의 성과 지표를 계산합니다."""
-    weights = np.array([data['weight'] for data in portfolio_data.values()])
-    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
-    
-    portfolio_returns = (returns * weights).sum(axis=1)
+    portfolio_returns = weighted_returns(portfolio_data)
     cumulative_returns = (1 + portfolio_returns).cumprod()
     
-    annual_return = portfolio_returns.mean() * 252
-    annual_volatility = portfolio_returns.std() * np.sqrt(252)
-    sharpe_ratio = annual_return / annual_volatility
+    metrics = cross_sectional_metrics(portfolio_returns.to_numpy(), risk_free_rate=0)
     
     return {
-        'Annual Return': annual_return,
-        'Annual Volatility': annual_volatility,
-        'Sharpe Ratio': sharpe_ratio,
+        'Annual Return': metrics['Annual Return'][0],
+        'Annual Volatility': metrics['Volatility'][0],
+        'Sharpe Ratio': metrics['Sharpe Ratio'][0],
         'Cumulative Returns': cumulative_returns
     }
 
-def analyze_risk(portfolio_data):
-    """포트폴리오의 리스크 지표를 계산합니다."""
-    weights = np.array([data['weight'] for data in portfolio_data.values()])
-    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
+def analyze_risk(portfolio_data, market_returns=None):
+    """포트폴리오의 리스크 지표를 계산합니다. market_returns는 load_market_returns의 결과입니다."""
+    portfolio_returns = weighted_returns(portfolio_data)
     
-    portfolio_returns = (returns * weights).sum(axis=1)
-    
-    # 베타 계산 (S&P 500을 시장 벤치마크로 사용)
-    market_returns = yf.download('^GSPC', start=returns.index[0], end=returns.index[-1])['Adj Close'].pct_change().dropna()
-    beta = portfolio_returns.cov(market_returns) / market_returns.var()
-    
-    # 알파 계산
-    risk_free_rate = 0.02 / 252  # 연 2%의 무위험 수익률 가정
-    alpha = portfolio_returns.mean() - risk_free_rate - beta * market_returns.mean()
-    
-    # 최대 낙폭 계산
-    cum_returns = (1 + portfolio_returns).cumprod()
-    running_max = cum_returns.cummax()
-    drawdown = (cum_returns - running_max) / running_max
-    max_drawdown = drawdown.min()
+    # 베타, 알파(연간화), 최대 낙폭 계산 (S&P 500을 시장 벤치마크로 사용, 연 2%의 무위험 수익률 가정)
+    market_returns = _market_returns(portfolio_returns.index, market_returns)
+    metrics = metrics_frame(portfolio_returns.to_frame('Portfolio'), market_returns).loc['Portfolio']
     
     return {
-        'Beta': beta,
-        'Alpha': alpha * 252,  # 연간화
-        'Max Drawdown': max_drawdown,
+        'Beta': metrics['Beta'],
+        'Alpha': metrics['Alpha'],
+        'Max Drawdown': metrics['Max Drawdown'],
         'Value at Risk (95%)': np.percentile(portfolio_returns, 5)
     }
 
-def analyze_asset_allocation(portfolio_df):
+def analyze_var(portfolio_data, horizons=HORIZONS, levels=CONFIDENCE_LEVELS, num_scenarios=NUM_SCENARIOS, seed=0, workers=1,
+                covariance_method='sample'):
+    """포트폴리오의 방법별(모수적, 과거, 블록 부트스트랩, 몬테카를로) 보유 기간별 VaR와 CVaR를 계산합니다."""
+    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
+    weights = [data['weight'] for data in portfolio_data.values()]
+    return value_at_risk(returns, weights, horizons, levels, num_scenarios=num_scenarios, seed=seed, workers=workers,
+                         covariance_method=covariance_method)
+
+def backtest_portfolio(portfolio_df, returns, rules, cost=0.0, cash_weight=0.0, cash_rate=0.0, workers=1):
+    """포트폴리오 표의 비중을 목표로 리밸런싱 규칙별 백테스트를 실행합니다.
+
+    rules는 {이름: backtest 키워드 인자} 딕셔너리이며, (규칙별 요약 지표 DataFrame, 규칙별 가치 DataFrame)을 반환합니다.
+    가격 데이터가 없는 ETF는 빼고 나머지 비중을 다시 맞춥니다.
+    """
+    holdings = portfolio_df[portfolio_df['ETF'].isin(returns.columns)]
+    returns = returns[list(holdings['ETF'])].dropna(how='all')
+    params = [dict(rule, cost=cost, cash_weight=cash_weight, cash_rate=cash_rate) for rule in rules.values()]
+    results = sweep(returns, holdings['Weight'].to_numpy(dtype=float), params, workers=workers)
+    values = pd.DataFrame({name: result['Value'] for name, result in zip(rules, results)})
+    return summarize(results, list(rules)), values
+
+def analyze_holdings(portfolio_data, market_returns=None):
+    """포트폴리오에 담긴 각 ETF의 성과 및 리스크 지표를 S&P 500 대비로 한 번에 계산합니다."""
+    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
+    market_returns = _market_returns(returns.index, market_returns)
+    return metrics_frame(returns, market_returns)
+
+def analyze_rolling_risk(portfolio_data, window=126, market_returns=None):
+    """포트폴리오의 롤링 변동성, 샤프 비율과 S&P 500 대비 베타, 상관계수를 날짜별 DataFrame으로 반환합니다."""
+    portfolio_returns = weighted_returns(portfolio_data)
+    market_returns = _market_returns(portfolio_returns.index, market_returns)
+    engine = RollingMetrics(['Portfolio'], window)
+    return engine.update(portfolio_returns.to_frame('Portfolio'), market_returns).xs('Portfolio', axis=1, level=1)
+
+def get_asset_categories(tickers):
+    """각 ETF의 카테고리를 조회합니다."""
+    # 요청이 실패한 ETF는 prefetch_info 결과에서 빠지므로 카테고리에도 포함되지 않습니다.
+    return {etf: info.get('category') or 'Other' for etf, info in prefetch_info(tickers).items()}
+
+def analyze_asset_allocation(portfolio_df, asset_categories=None):
     """포트폴리오의 자산 배분을 분석합니다."""
+    if asset_categories is None:
+        asset_categories = get_asset_categories(portfolio_df['ETF'])
     asset_allocation = {}
     for etf, weight in portfolio_df[['ETF', 'Weight']].values:
-        try:
-            info = yf.Ticker(etf).info
-            category = info.get('category', 'Other')
-            if category not in asset_allocation:
-                asset_allocation[category] = 0
-            asset_allocation[category] += weight
-        except Exception as e:
-            print(f"Error fetching info for {etf}: {e}")
+        if etf not in asset_categories:
+            continue
+        category = asset_categories[etf]
+        if category not in asset_allocation:
+            asset_allocation[category] = 0
+        asset_allocation[category] += weight
     return asset_allocation
 
-def optimize_portfolio(portfolio_data):
-    """효율적 프론티어를 계산하고 최적의 포트폴리오를 제안합니다."""
-    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
-    mean_returns = returns.mean()
-    cov_matrix = returns.cov()
-    
-    num_assets = len(portfolio_data)
-    num_portfolios = 10000
+def simulate_frontier(mean_returns, cov_matrix, num_portfolios=10000, chunk_size=100000, seed=None):
+    """무작위 가중치 포트폴리오들의 변동성, 수익률, 샤프 비율을 행렬 연산으로 계산합니다.
+
+    가중치는 chunk_size개씩 나누어 생성하므로 표본 수가 커져도 메모리 사용량은 chunk_size x 자산 수로 제한됩니다.
+    """
+    mean_returns = np.asarray(mean_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    rng = np.random.default_rng(seed)
     results = np.zeros((3, num_portfolios))
-    
-    for i in range(num_portfolios):
-        weights = np.random.random(num_assets)
-        weights /= np.sum(weights)
-        portfolio_return = np.sum(mean_returns * weights) * 252
-        portfolio_std_dev = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))) * np.sqrt(252)
-        results[0,i] = portfolio_std_dev
-        results[1,i] = portfolio_return
-        results[2,i] = portfolio_return / portfolio_std_dev
-    
-    def portfolio_return(weights):
-        return np.sum(mean_returns * weights) * 252
 
-    def portfolio_volatility(weights):
-        return np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))) * np.sqrt(252)
+    for start in range(0, num_portfolios, chunk_size):
+        stop = min(start + chunk_size, num_portfolios)
+        weights = rng.random((stop - start, len(mean_returns)))
+        weights /= weights.sum(axis=1, keepdims=True)
+        portfolio_return = weights @ mean_returns * 252
+        portfolio_std_dev = np.sqrt(np.einsum('ij,ij->i', weights @ cov_matrix, weights)) * np.sqrt(252)
+        results[0, start:stop] = portfolio_std_dev
+        results[1, start:stop] = portfolio_return
+        results[2, start:stop] = portfolio_return / portfolio_std_dev
 
-    def min_function(weights):
-        return -portfolio_return(weights) / portfolio_volatility(weights)
+    return results
 
-    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
+def exact_frontier(mean_returns, cov_matrix, num_points=50):
+    """목표 수익률별 최소 분산 이차계획 문제를 풀어 정확한 효율적 프론티어를 계산합니다."""
+    mean_returns = np.asarray(mean_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    num_assets = len(mean_returns)
     bounds = tuple((0, 1) for asset in range(num_assets))
+    # 공매도가 없으면 달성 가능한 수익률은 개별 자산 수익률의 최소~최대 구간입니다.
+    targets = np.linspace(mean_returns.min(), mean_returns.max(), num_points)
+
+    # 일간 분산과 수익률은 SLSQP 허용 오차보다 작으므로 크기를 1 근처로 맞춰서 풉니다.
+    cov_scale = 1. / np.mean(np.diag(cov_matrix))
+    mean_scale = 1. / max(np.abs(mean_returns).max(), 1e-12)
+    scaled_cov = cov_matrix * cov_scale
+    scaled_mean = mean_returns * mean_scale
+
+    results = np.full((3, num_points), np.nan)
+    weights = np.full(num_assets, 1. / num_assets)
+    for i, target in enumerate(targets * mean_scale):
+        constraints = (
+            {'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)},
+            {'type': 'eq', 'fun': lambda x, target=target: x @ scaled_mean - target, 'jac': lambda x: scaled_mean},
+        )
+        solution = minimize(
+            lambda x: x @ scaled_cov @ x, weights,
+            jac=lambda x: 2 * scaled_cov @ x,
+            method='SLSQP', bounds=bounds, constraints=constraints
+        )
+        if not solution.success:
+            continue
+        # 이전 해에서 다음 목표 수익률을 시작하면 수렴이 빨라집니다.
+        weights = solution.x
+        portfolio_return = weights @ mean_returns * 252
+        portfolio_std_dev = np.sqrt(weights @ cov_matrix @ weights * 252)
+        results[:, i] = portfolio_std_dev, portfolio_return, portfolio_return / portfolio_std_dev
+
+    return results[:, ~np.isnan(results[0])]
+
+def max_sharpe_portfolio(mean_returns, cov_matrix, initial_weights=None, max_weight=None,
+                         groups=None, group_caps=None, current_weights=None, max_turnover=None):
+    """해석적 기울기를 사용해 샤프 비율이 최대인 가중치를 NumPy 배열 위에서 구합니다.
+
+    max_weight는 자산별 상한(스칼라 또는 배열), groups는 자산별 그룹 이름, group_caps는 그룹별 상한,
+    max_turnover는 current_weights 대비 |w - w0|의 합 상한입니다. initial_weights가 주어지면 그 지점에서 시작합니다.
+    반환값의 fun은 음의 연율화 샤프 비율입니다.
+    """
+    mean_returns = np.asarray(mean_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    num_assets = len(mean_returns)
+    annualization = np.sqrt(252)
+
+    upper = np.ones(num_assets) if max_weight is None else np.broadcast_to(np.asarray(max_weight, dtype=float), (num_assets,))
+    bounds = [(0, cap) for cap in upper]
+
+    if initial_weights is None:
+        weights = np.full(num_assets, 1. / num_assets)
+    else:
+        weights = np.clip(np.asarray(initial_weights, dtype=float), 0, upper)
+        weights = weights / weights.sum() if weights.sum() > 0 else np.full(num_assets, 1. / num_assets)
+
+    def neg_sharpe(x):
+        w = x[:num_assets]
+        volatility = np.sqrt(w @ cov_matrix @ w)
+        return -annualization * (mean_returns @ w) / volatility
+
+    def neg_sharpe_jac(x):
+        w = x[:num_assets]
+        cov_w = cov_matrix @ w
+        variance = w @ cov_w
+        volatility = np.sqrt(variance)
+        grad = np.zeros_like(x)
+        grad[:num_assets] = -annualization * (mean_returns / volatility - (mean_returns @ w) * cov_w / (variance * volatility))
+        return grad
+
+    use_turnover = max_turnover is not None and current_weights is not None
+    num_vars = 2 * num_assets if use_turnover else num_assets
+
+    def weight_row(row):
+        # 보조 변수가 있을 때 가중치 부분만 채운 기울기 행을 만듭니다.
+        full = np.zeros(num_vars)
+        full[:num_assets] = row
+        return full
+
+    constraints = [{'type': 'eq', 'fun': lambda x: np.sum(x[:num_assets]) - 1,
+                    'jac': lambda x: weight_row(np.ones(num_assets))}]
+
+    if groups is not None and group_caps:
+        groups = np.asarray(groups)
+        for group, cap in group_caps.items():
+            members = (groups == group).astype(float)
+            if members.any():
+                constraints.append({'type': 'ineq', 'fun': lambda x, members=members, cap=cap: cap - members @ x[:num_assets],
+                                    'jac': lambda x, members=members: weight_row(-members)})
+
+    x0 = weights
+    if use_turnover:
+        # |w - w0|를 보조 변수 t로 나누어 w - w0 <= t, w0 - w <= t, sum(t) <= max_turnover로 매끄럽게 표현합니다.
+        current_weights = np.asarray(current_weights, dtype=float)
+        identity = np.eye(num_assets)
+        constraints += [
+            {'type': 'ineq', 'fun': lambda x: x[num_assets:] - (x[:num_assets] - current_weights),
+             'jac': lambda x: np.hstack([-identity, identity])},
+            {'type': 'ineq', 'fun': lambda x: x[num_assets:] + (x[:num_assets] - current_weights),
+             'jac': lambda x: np.hstack([identity, identity])},
+            {'type': 'ineq', 'fun': lambda x: max_turnover - np.sum(x[num_assets:]),
+             'jac': lambda x: np.concatenate([np.zeros(num_assets), -np.ones(num_assets)])},
+        ]
+        bounds = bounds + [(0, 2)] * num_assets
+        x0 = np.concatenate([weights, np.abs(weights - current_weights)])
+
+    result = minimize(neg_sharpe, x0, jac=neg_sharpe_jac, method='SLSQP', bounds=bounds, constraints=constraints)
+    result.x = result.x[:num_assets]
+    result.jac = result.jac[:num_assets]
+    return result
+
+def optimize_portfolio(portfolio_data, num_portfolios=10000, frontier='sampling', num_points=50, chunk_size=100000,
+                       initial_weights=None, max_weight=None, asset_categories=None, group_caps=None, max_turnover=None,
+                       covariance_method='sample'):
+    """효율적 프론티어를 계산하고 최적의 포트폴리오를 제안합니다.
+
+    frontier='sampling'이면 num_portfolios개의 무작위 포트폴리오를, 'exact'이면 num_points개의 목표 수익률에서 푼 프론티어를 반환합니다.
+    initial_weights, max_weight는 ETF별 딕셔너리 또는 스칼라(max_weight)이며, group_caps는 asset_categories의 카테고리별 상한,
+    max_turnover는 현재 비중 대비 최대 회전율입니다. covariance_method는 공유 공분산 추정기의 방법('sample', 'ledoit_wolf',
+    'ewma')이며, 같은 수익률에 대한 VaR 계산과 추정치를 함께 씁니다.
+    """
+    returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
+    tickers = list(returns.columns)
+    mean_returns = returns.mean().to_numpy()
+    cov_matrix = covariance(returns, covariance_method).to_numpy()
     
-    optimal_portfolio = minimize(min_function, num_assets*[1./num_assets], method='SLSQP', bounds=bounds, constraints=constraints)
+    if frontier == 'exact':
+        results = exact_frontier(mean_returns, cov_matrix, num_points)
+    else:
+        results = simulate_frontier(mean_returns, cov_matrix, num_portfolios, chunk_size)
+
+    if isinstance(initial_weights, dict):
+        initial_weights = [initial_weights.get(etf, 0.0) for etf in tickers]
+    if isinstance(max_weight, dict):
+        max_weight = [max_weight.get(etf, 1.0) for etf in tickers]
+    groups = [asset_categories.get(etf, 'Other') for etf in tickers] if asset_categories else None
+    current_weights = [portfolio_data[etf]['weight'] for etf in tickers]
+
+    optimal_portfolio = max_sharpe_portfolio(
+        mean_returns, cov_matrix, initial_weights=initial_weights, max_weight=max_weight,
+        groups=groups, group_caps=group_caps, current_weights=current_weights, max_turnover=max_turnover
+    )
+    optimal_portfolio.tickers = tickers
+    optimal_portfolio.annual_return = mean_returns @ optimal_portfolio.x * 252
+    optimal_portfolio.annual_volatility = np.sqrt(optimal_portfolio.x @ cov_matrix @ optimal_portfolio.x * 252)
     
     return results, optimal_portfolio
\ No newline at end of file
@@ -0,0 +1,223 @@
+import os
+import json
+import threading
+import pandas as pd
+from providers import DAILY, get_provider, request
+
+STORE_DIR = os.getenv("PRICE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".price_store"))
+BATCH_SIZE = 20
+
+# 분봉은 제공자가 최근 구간만 제공하고 한 번에 요청할 수 있는 기간도 제한됩니다: 간격 -> (조회 가능 일수, 요청당 최대 일수)
+INTRADAY_LIMITS = {
+    "1m": (29, 7),
+    "5m": (59, 59),
+    "15m": (59, 59),
+    "30m": (59, 59),
+    "60m": (729, 729),
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _ticker_lock(ticker):
+    """티커별 쓰기 잠금을 반환합니다."""
+    with _locks_guard:
+        if ticker not in _locks:
+            _locks[ticker] = threading.Lock()
+        return _locks[ticker]
+
+
+def _store_dir():
+    """현재 제공자의 저장소 디렉터리입니다. yfinance 이외의 백엔드는 실제 시세와 섞이지 않도록 하위 디렉터리를 씁니다."""
+    name = get_provider().name
+    return STORE_DIR if name == "yfinance" else os.path.join(STORE_DIR, name)
+
+
+def _paths(ticker, interval=DAILY):
+    """티커의 가격 파일(분봉은 월별 파일 디렉터리)과 메타데이터 파일 경로를 반환합니다."""
+    name = ticker.replace(os.sep, "_")
+    store_dir = _store_dir()
+    if interval == DAILY:
+        return os.path.join(store_dir, f"{name}.parquet"), os.path.join(store_dir, f"{name}.json")
+    # 분봉은 수백만 행까지 쌓일 수 있으므로 월별 파일로 나누어, 새 구간이 닿는 달만 다시 쓰고 요청한 달만 읽습니다.
+    directory = os.path.join(store_dir, interval, name)
+    return directory, directory + ".json"
+
+
+def _partition_path(directory, month):
+    return os.path.join(directory, f"{month}.parquet")
+
+
+def _read_coverage(ticker, interval=DAILY):
+    """저장소에 기록된 티커의 보유 구간을 읽어옵니다."""
+    _, meta_path = _paths(ticker, interval)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"])
+
+
+def _read(ticker, interval=DAILY, months=None):
+    """저장소에서 가격 데이터와 보유 구간을 읽어옵니다. 분봉은 months(월 문자열 목록)에 해당하는 파일만 읽습니다."""
+    data_path, _ = _paths(ticker, interval)
+    coverage = _read_coverage(ticker, interval)
+    if coverage is None or not os.path.exists(data_path):
+        return pd.DataFrame(), None
+    if interval == DAILY:
+        return pd.read_parquet(data_path), coverage
+    if months is None:
+        months = [name[:-len(".parquet")] for name in os.listdir(data_path) if name.endswith(".parquet")]
+    paths = [_partition_path(data_path, month) for month in sorted(months)]
+    frames = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+    return (pd.concat(frames) if frames else pd.DataFrame()), coverage
+
+
+def _months(start, end):
+    """[start, end) 구간에 걸친 월 문자열 목록을 반환합니다."""
+    return [str(month) for month in pd.period_range(start, end - pd.Timedelta(1, "ns"), freq="M")]
+
+
+def _write(ticker, data, coverage, interval=DAILY):
+    """가격 데이터와 보유 구간을 원자적으로 저장합니다. 분봉은 data에 포함된 달의 파일만 다시 씁니다."""
+    data_path, meta_path = _paths(ticker, interval)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    if interval == DAILY:
+        data.to_parquet(data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+    else:
+        os.makedirs(data_path, exist_ok=True)
+        for month, partition in ([] if data.empty else data.groupby(data.index.to_period("M"))):
+            path = _partition_path(data_path, month)
+            partition.to_parquet(path + ".tmp")
+            os.replace(path + ".tmp", path)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"start": coverage[0].isoformat(), "end": coverage[1].isoformat()}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _download_many(tickers, start, end, interval=DAILY):
+    """여러 티커의 [start, end) 구간을 현재 데이터 제공자에 한 번의 그룹 요청으로 내려받습니다."""
+    return get_provider().download(tickers, start, end, interval)
+
+
+def _missing_ranges(coverage, start, end):
+    """저장소에 없는 구간 목록을 계산합니다."""
+    if coverage is None:
+        return [(start, end)]
+    ranges = []
+    if start < coverage[0]:
+        ranges.append((start, coverage[0]))
+    if end > coverage[1]:
+        ranges.append((coverage[1], end))
+    return ranges
+
+
+def _split_range(start, end, interval):
+    """분봉 요청 구간을 제공자의 요청당 최대 기간 이하로 나눕니다."""
+    if interval == DAILY:
+        return [(start, end)]
+    span = pd.Timedelta(days=INTRADAY_LIMITS[interval][1])
+    bounds = list(pd.date_range(start, end, freq=span)) + [end]
+    return [(left, right) for left, right in zip(bounds[:-1], bounds[1:]) if left < right]
+
+
+def _extend_coverage(coverage, pieces, covered_end):
+    """오류 없이 끝난 요청 구간을 보유 구간에 이어 붙입니다.
+
+    실패한 요청은 pieces에 들어오지 않습니다. 오류 없이 빈 결과가 돌아온 구간(주말·휴장일, 상장 전 기간)도 데이터가 없는 것이
+    확정되었으므로 보유 구간으로 기록해 다시 요청하지 않습니다. 오늘 이후는 기록하지 않으므로 장 마감 전의 빈 결과는 다음 요청에서
+    다시 받습니다. 보유 구간은 하나의 연속 구간이므로 기존 구간에 맞닿은 구간만 이어 붙입니다.
+    """
+    pieces = sorted((start, min(end, covered_end)) for start, end, _ in pieces if start < covered_end)
+    changed = True
+    while pieces and changed:
+        changed = False
+        for piece in list(pieces):
+            start, end = piece
+            if coverage is None or (start <= coverage[1] and end >= coverage[0]):
+                coverage = (start, end) if coverage is None else (min(coverage[0], start), max(coverage[1], end))
+                pieces.remove(piece)
+                changed = True
+    return coverage
+
+
+def _merge(ticker, pieces, covered_end, interval=DAILY):
+    """내려받은 (구간 시작, 구간 끝, 데이터) 목록을 저장소 데이터와 병합하고 보유 구간을 갱신합니다."""
+    with _ticker_lock(ticker):
+        frames = [frame for _, _, frame in pieces]
+        months = None
+        if interval != DAILY:
+            # 분봉은 새 데이터가 닿는 달의 파일만 읽어 병합합니다.
+            months = sorted({str(month) for frame in frames if not frame.empty for month in frame.index.to_period("M").unique()})
+        data, coverage = _read(ticker, interval, months)
+        frames = [frame for frame in [data] + frames if not frame.empty]
+        if frames:
+            data = pd.concat(frames)
+            data = data[~data.index.duplicated(keep="last")].sort_index()
+        coverage = _extend_coverage(coverage, pieces, covered_end)
+        # 데이터가 없다고 확정된 티커도 보유 구간을 기록해 두어야 다음 요청에서 다시 내려받지 않습니다.
+        if coverage is not None:
+            _write(ticker, data, coverage, interval)
+        # 분봉은 병합한 달만 들고 있으므로 호출한 쪽에서 요청 구간을 다시 읽습니다.
+        return data if interval == DAILY else None
+
+
+def get_prices_batch(tickers, start_date, end_date, interval=DAILY, fetch=True):
+    """여러 티커의 [start_date, end_date) 구간 OHLCV 데이터를 반환합니다.
+
+    누락 구간이 같은 티커끼리 묶어 그룹 요청으로 내려받고, 원격 제공자의 그룹 요청은 요청 스케줄러에서 속도 제한과 재시도를 거쳐 동시에 실행됩니다.
+    interval은 "1d"(일봉) 또는 INTRADAY_LIMITS의 분봉 간격이며, 분봉은 제공자가 보관하는 최근 구간으로 시작일을 당깁니다.
+    fetch가 거짓이면 내려받지 않고 저장소에 있는 데이터만 돌려줍니다 (요청 스케줄러의 스레드가 없는 fork 작업 프로세스용).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    today = pd.Timestamp.today().normalize()
+    if interval != DAILY:
+        start = max(start, today - pd.Timedelta(days=INTRADAY_LIMITS[interval][0]))
+        end = max(end, start)
+    # 오늘 이후 구간은 아직 확정되지 않았으므로 보유 구간으로 기록하지 않습니다.
+    covered_end = min(end, today)
+
+    groups = {}
+    for ticker in tickers if fetch else []:
+        for missing in _missing_ranges(_read_coverage(ticker, interval), start, end):
+            groups.setdefault(missing, []).append(ticker)
+
+    jobs = []
+    for (range_start, range_end), group in groups.items():
+        for piece_start, piece_end in _split_range(range_start, range_end, interval):
+            for i in range(0, len(group), BATCH_SIZE):
+                jobs.append((group[i:i + BATCH_SIZE], piece_start, piece_end, interval))
+
+    downloaded = {ticker: [] for ticker in tickers}
+    # 같은 그룹과 구간을 다른 세션이 이미 요청 중이면 그 요청의 결과를 함께 씁니다.
+    futures = [request(("prices", tuple(group), job_start, job_end, interval),
+                       _download_many, group, job_start, job_end, interval)
+               for group, job_start, job_end, _ in jobs]
+    for (group, job_start, job_end, _), future in zip(jobs, futures):
+        try:
+            frames = future.result()
+        except Exception as e:
+            # 한 그룹이 실패해도 나머지 티커는 계속 처리하고, 실패한 그룹은 저장소에 있는 데이터만 돌려줍니다.
+            print(f"Error fetching prices for {', '.join(group)}: {e}")
+            continue
+        for ticker, frame in frames.items():
+            downloaded[ticker].append((job_start, job_end, frame))
+
+    prices = {}
+    for ticker in tickers:
+        data = _merge(ticker, downloaded[ticker], covered_end, interval) if downloaded[ticker] else None
+        if data is None:
+            data, _ = _read(ticker, interval, None if interval == DAILY else _months(start, end))
+        if not data.empty:
+            data = data.loc[(data.index >= start) & (data.index < end)]
+        prices[ticker] = data
+    return prices
+
+
+def get_prices(ticker, start_date, end_date, interval=DAILY, fetch=True):
+    """저장소에서 [start_date, end_date) 구간의 OHLCV 데이터를 반환하고, 없는 구간만 내려받습니다."""
+    return get_prices_batch([ticker], start_date, end_date, interval=interval, fetch=fetch)[ticker]
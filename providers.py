@@ -0,0 +1,344 @@
+"""시세와 종목 정보를 가져오는 데이터 제공자 백엔드입니다.
+
+MARKET_DATA_PROVIDER 환경 변수로 백엔드를 고릅니다.
+
+    yfinance   yfinance로 내려받습니다 (기본값)
+    replay     PROVIDER_REPLAY_DIR에 기록해 둔 Parquet/JSON 스냅숏을 그대로 돌려줍니다
+    synthetic  어떤 티커든 기하 브라운 운동(GBM)으로 만든 가격을 돌려줍니다 (PROVIDER_SEED로 시드 지정)
+
+스냅숏은 다음처럼 기록합니다.
+
+    python providers.py record snapshots SPY QQQ --start 2015-01-01 --end 2025-01-01
+"""
+import os
+import json
+import zlib
+import argparse
+import threading
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from scheduler import scheduler
+
+DAILY = "1d"
+REPLAY_DIR = os.getenv("PROVIDER_REPLAY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+TRADING_DAYS = 252
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+class MarketDataProvider:
+    """데이터 제공자 인터페이스입니다.
+
+    remote가 참인 백엔드는 네트워크를 쓰므로 요청 스케줄러의 속도 제한과 재시도를 거치고, 로컬 백엔드는 바로 실행됩니다.
+    name은 가격 저장소와 정보 캐시를 백엔드별로 나누는 데 쓰입니다.
+    """
+
+    name = None
+    remote = False
+
+    def download(self, tickers, start, end, interval=DAILY):
+        """[start, end) 구간의 OHLCV 데이터를 {티커: DataFrame}으로 반환합니다. 데이터가 없는 티커는 빈 DataFrame입니다."""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """yf.Ticker(ticker).info 형식의 종목 정보 딕셔너리를 반환합니다."""
+        raise NotImplementedError
+
+
+def _flatten(data):
+    """단일 티커 데이터의 다중 컬럼을 OHLCV 컬럼으로 정리합니다."""
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+def _normalize_bars(data):
+    """분봉의 시간대 정보를 거래소 현지 시각으로 떼어 내고, 없으면 Adj Close를 Close로 채웁니다."""
+    if data.empty:
+        return data
+    if data.index.tz is not None:
+        data.index = data.index.tz_localize(None)
+    if "Adj Close" not in data and "Close" in data:
+        data["Adj Close"] = data["Close"]
+    return data
+
+
+def _weekdays_before_today(start, end):
+    """[start, end) 구간에서 오늘 이전 평일의 수입니다. 이 값이 0이면 빈 결과가 정상입니다 (휴장일은 구분하지 않습니다)."""
+    last = min(pd.Timestamp(end), pd.Timestamp.today().normalize()) - pd.Timedelta(days=1)
+    return len(pd.bdate_range(pd.Timestamp(start), last)) if last >= pd.Timestamp(start) else 0
+
+
+def _check_download(tickers, start, end, result, missing=()):
+    """yf.download는 제한이나 HTTP 오류를 예외 대신 로그로 남기고 빈 결과를 돌려주므로, 결과의 모양으로 실패를 판단합니다.
+
+    요청한 티커의 컬럼이 없거나, 오늘 이전 평일이 있는 구간인데 모든 티커가 비어 있으면 ConnectionError를 일으켜 요청 스케줄러가
+    다시 시도하게 합니다. 다른 티커는 데이터가 있는데 일부만 비어 있으면 그 티커는 해당 구간에 데이터가 없는 것(상장 전 등)으로 봅니다.
+    """
+    if missing:
+        raise ConnectionError(f"No price columns returned for {', '.join(missing)}")
+    if all(frame.empty for frame in result.values()) and _weekdays_before_today(start, end):
+        raise ConnectionError(f"No price data returned for {', '.join(tickers)} between {start} and {end}")
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+    remote = True
+
+    def download(self, tickers, start, end, interval=DAILY):
+        import yfinance as yf
+        if len(tickers) == 1:
+            data = _flatten(yf.download(tickers[0], start=start, end=end, interval=interval, auto_adjust=False,
+                                        progress=False))
+            result = {tickers[0]: data if interval == DAILY else _normalize_bars(data)}
+            _check_download(tickers, start, end, result)
+            return result
+        data = yf.download(tickers, start=start, end=end, interval=interval, auto_adjust=False, progress=False,
+                           group_by="ticker", threads=False)
+        # yfinance는 티커를 대문자로 바꿔 컬럼에 씁니다.
+        columns = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+        result = {}
+        missing = []
+        for ticker in tickers:
+            column = ticker if ticker in columns else ticker.upper()
+            if column in columns:
+                result[ticker] = data[column].dropna(how="all")
+                if interval != DAILY:
+                    result[ticker] = _normalize_bars(result[ticker])
+            else:
+                result[ticker] = pd.DataFrame()
+                missing.append(ticker)
+        _check_download(tickers, start, end, result, missing)
+        return result
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+
+def _file_name(ticker):
+    return ticker.replace(os.sep, "_")
+
+
+class ReplayProvider(MarketDataProvider):
+    """기록된 스냅숏을 돌려주는 백엔드입니다. 가격은 directory/interval/티커.parquet, 정보는 directory/info/티커.json에 있습니다."""
+
+    name = "replay"
+
+    def __init__(self, directory=REPLAY_DIR):
+        self.directory = directory
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, ticker, interval):
+        # 스냅숏 파일은 바뀌지 않으므로 한 번 읽은 파일은 메모리에 둡니다.
+        key = (ticker, interval)
+        with self._lock:
+            if key in self._frames:
+                return self._frames[key]
+        path = os.path.join(self.directory, interval, f"{_file_name(ticker)}.parquet")
+        data = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+        with self._lock:
+            self._frames[key] = data
+        return data
+
+    def download(self, tickers, start, end, interval=DAILY):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        result = {}
+        for ticker in tickers:
+            data = self._frame(ticker, interval)
+            result[ticker] = data.loc[(data.index >= start) & (data.index < end)] if not data.empty else data
+        return result
+
+    def info(self, ticker):
+        path = os.path.join(self.directory, "info", f"{_file_name(ticker)}.json")
+        if not os.path.exists(path):
+            raise LookupError(f"{ticker}의 정보 스냅숏이 없습니다: {path}")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def record(source, tickers, start, end, directory=REPLAY_DIR, interval=DAILY, include_info=True):
+    """source 제공자의 가격(과 정보)을 ReplayProvider가 읽는 스냅숏으로 기록하고, 기록한 티커 목록을 반환합니다."""
+    os.makedirs(os.path.join(directory, interval), exist_ok=True)
+    recorded = []
+    for ticker, data in source.download(list(tickers), start, end, interval).items():
+        if data.empty:
+            print(f"No data recorded for {ticker}")
+            continue
+        data.to_parquet(os.path.join(directory, interval, f"{_file_name(ticker)}.parquet"))
+        recorded.append(ticker)
+    if include_info:
+        os.makedirs(os.path.join(directory, "info"), exist_ok=True)
+        for ticker in recorded:
+            try:
+                info = source.info(ticker)
+            except Exception as e:
+                print(f"Error recording info for {ticker}: {e}")
+                continue
+            with open(os.path.join(directory, "info", f"{_file_name(ticker)}.json"), "w", encoding="utf-8") as f:
+                json.dump(info, f, default=str)
+    return recorded
+
+
+class SyntheticProvider(MarketDataProvider):
+    """어떤 티커든 결정적인 GBM 가격을 만들어 주는 백엔드입니다.
+
+    모든 티커는 공통 시장 충격에 티커별 상관계수(0.3~0.9)로 묶이고, 티커별 연 변동성(10~40%)과 기대수익률을 가집니다.
+    일봉 경로는 origin부터 만들어 자르므로 어떤 구간을 요청해도 같은 날짜의 가격은 같습니다. 분봉은 전날 종가에서
+    그날 종가까지 이어지는 브라운 다리(Brownian bridge)로 채웁니다.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, seed=0, origin="1990-01-01"):
+        self.seed = seed
+        self.origin = pd.Timestamp(origin)
+        self._market = np.empty(0)
+        self._lock = threading.Lock()
+
+    def _rng(self, *parts):
+        return np.random.default_rng([self.seed] + [zlib.crc32(str(part).encode("utf-8")) for part in parts])
+
+    def _market_shocks(self, n):
+        """origin부터 n 영업일의 공통 시장 충격을 반환합니다. 길이가 늘어나면 같은 난수열을 더 길게 다시 뽑습니다."""
+        with self._lock:
+            if len(self._market) < n:
+                self._market = self._rng("__market__").standard_normal(max(n, 2 * len(self._market)))
+            return self._market[:n]
+
+    def _params(self, ticker):
+        rng = self._rng(ticker, "params")
+        return rng.uniform(0.3, 0.9), rng.uniform(0.10, 0.40), rng.uniform(0.0, 0.12), rng.uniform(20, 500)
+
+    def _daily(self, ticker, end):
+        """origin부터 end 직전까지의 영업일 종가 Series를 만듭니다."""
+        # bdate_range는 날짜마다 파이썬 루프를 돌아 수천 티커에서 느리므로 달력일에서 주말을 걸러 냅니다.
+        days = pd.date_range(self.origin, end, freq="D", inclusive="left")
+        index = days[days.dayofweek < 5]
+        rho, sigma, mu, price = self._params(ticker)
+        shocks = rho * self._market_shocks(len(index)) + np.sqrt(1 - rho ** 2) * self._rng(ticker).standard_normal(len(index))
+        dt = 1 / TRADING_DAYS
+        log_returns = (mu - sigma ** 2 / 2) * dt + sigma * np.sqrt(dt) * shocks
+        return pd.Series(price * np.exp(np.cumsum(log_returns)), index=index), sigma
+
+    def _bars(self, ticker, close, start, end, interval, sigma):
+        """분봉 종가를 날마다 전날 종가에서 그날 종가로 끝나는 브라운 다리로 만듭니다."""
+        minutes = int(interval[:-1])
+        times = pd.timedelta_range("09:30:00", "16:00:00", freq=f"{minutes}min", closed="left")
+        days = close.index[(close.index >= start.normalize()) & (close.index < end)]
+        previous = close.shift(1).bfill()
+        frames = []
+        for day in days:
+            steps = self._rng(ticker, interval, day.date()).standard_normal(len(times))
+            path = np.cumsum(steps) * sigma * np.sqrt(1 / (TRADING_DAYS * len(times)))
+            bridge = path - np.arange(1, len(times) + 1) / len(times) * path[-1]
+            level = np.linspace(np.log(previous[day]), np.log(close[day]), len(times) + 1)[1:]
+            frames.append(pd.Series(np.exp(level + bridge), index=day + times))
+        if not frames:
+            return pd.Series(dtype=float)
+        bars = pd.concat(frames)
+        return bars.loc[(bars.index >= start) & (bars.index < end)]
+
+    def download(self, tickers, start, end, interval=DAILY):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        result = {}
+        for ticker in tickers:
+            close, sigma = self._daily(ticker, end)
+            if interval == DAILY:
+                close = close.loc[close.index >= start]
+            else:
+                close = self._bars(ticker, close, start, end, interval, sigma)
+            # 시가는 전 봉 종가, 고가와 저가는 봉 하나의 변동성 크기로 두 값을 감싸도록 둡니다.
+            bars_per_day = 1 if interval == DAILY else 390 // int(interval[:-1])
+            open_ = close.shift(1).fillna(close)
+            spread = (np.abs(self._rng(ticker, "range", interval).standard_normal(len(close)))
+                      * sigma / np.sqrt(TRADING_DAYS * bars_per_day) * 0.5 * close.to_numpy())
+            result[ticker] = pd.DataFrame({
+                "Open": open_,
+                "High": np.maximum(open_, close) + spread,
+                "Low": np.minimum(open_, close) - spread,
+                "Close": close,
+                "Adj Close": close,
+                "Volume": self._rng(ticker, "volume", interval).integers(10 ** 5, 10 ** 7, len(close)),
+            }, index=close.index)[OHLCV_COLUMNS]
+        return result
+
+    def info(self, ticker):
+        rho, sigma, mu, price = self._params(ticker)
+        rng = self._rng(ticker, "info")
+        return {
+            "symbol": ticker,
+            "shortName": f"Synthetic {ticker}",
+            "longName": f"Synthetic {ticker} ETF",
+            "quoteType": "ETF",
+            "category": ["Large Blend", "Technology", "Intermediate Core Bond", "Foreign Large Blend"][rng.integers(4)],
+            "regularMarketPreviousClose": round(float(price), 2),
+            "expenseRatio": round(float(rng.uniform(0.0003, 0.0075)), 4),
+            "totalAssets": float(rng.uniform(1e8, 1e11)),
+            "yield": round(float(rng.uniform(0.0, 0.05)), 4),
+        }
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name):
+    """이름으로 백엔드를 만듭니다."""
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "replay":
+        return ReplayProvider()
+    if name == "synthetic":
+        return SyntheticProvider(seed=int(os.getenv("PROVIDER_SEED", 0)))
+    raise ValueError(f"알 수 없는 데이터 제공자입니다: {name}")
+
+
+def get_provider():
+    """현재 데이터 제공자를 반환합니다. 처음 호출될 때 MARKET_DATA_PROVIDER로 정합니다."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider(os.getenv("MARKET_DATA_PROVIDER", "yfinance"))
+        return _provider
+
+
+def set_provider(provider):
+    """데이터 제공자를 바꿉니다. 벤치마크나 부하 시험에서 네트워크 대신 로컬 백엔드를 쓸 때 사용합니다."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def request(key, func, *args):
+    """제공자 요청을 실행하고 Future를 반환합니다.
+
+    원격 백엔드의 요청은 스케줄러에서 속도 제한, 재시도, 같은 요청 병합을 거치고, 로컬 백엔드는 호출한 스레드에서 바로
+    실행되어 계산 성능을 네트워크 지연과 따로 잴 수 있습니다.
+    """
+    provider = get_provider()
+    if provider.remote:
+        return scheduler.submit((provider.name,) + tuple(key), func, *args)
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="데이터 제공자 스냅숏 기록")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="현재 제공자의 가격과 정보를 스냅숏으로 기록")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("tickers", nargs="+")
+    record_parser.add_argument("--start", required=True)
+    record_parser.add_argument("--end", required=True)
+    record_parser.add_argument("--interval", default=DAILY)
+    record_parser.add_argument("--no-info", action="store_true")
+    args = parser.parse_args()
+
+    recorded = record(get_provider(), args.tickers, args.start, args.end, args.directory, args.interval, not args.no_info)
+    print(f"{len(recorded)}개 티커를 {args.directory}에 기록했습니다.")
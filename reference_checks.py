@@ -0,0 +1,221 @@
+"""벡터화한 분석 엔진을 단순한 참조 구현과 비교하는 수치 검증과, 네트워크 없이 흉내 낸 데이터 제공자 경로 검증입니다.
+
+엔진을 고친 뒤 다음처럼 실행해 결과가 그대로인지 확인합니다. 하나라도 어긋나면 종료 코드 1로 끝납니다.
+
+    python reference_checks.py
+    python reference_checks.py --only backtest
+"""
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+TOLERANCE = 1e-10
+CHECKS = {}
+
+
+def check(name):
+    """검증 함수를 등록하는 데코레이터입니다. 함수는 어긋나면 AssertionError를 일으킵니다."""
+    def register(func):
+        CHECKS[name] = func
+        return func
+    return register
+
+
+def _returns(num_days=900, num_assets=8, seed=0, gaps=True):
+    """상관된 합성 일간 수익률입니다. gaps가 참이면 상장일이 다른 것처럼 열마다 앞부분과 중간 일부를 NaN으로 둡니다."""
+    rng = np.random.default_rng(seed)
+    market = rng.standard_normal(num_days)
+    values = 0.01 * (rng.standard_normal((num_days, num_assets)) + market[:, None] * rng.uniform(-1, 1, num_assets))
+    returns = pd.DataFrame(values, index=pd.bdate_range("2015-01-01", periods=num_days),
+                           columns=[f"A{i}" for i in range(num_assets)])
+    if gaps:
+        for j in range(1, num_assets):
+            returns.iloc[:rng.integers(0, num_days // 3), j] = np.nan
+            returns.iloc[rng.integers(0, num_days, 10), j] = np.nan
+    return returns
+
+
+def _naive_backtest(returns, weights, cost, rebalance):
+    """날마다 보유 금액을 갱신하는 참조 백테스트입니다. rebalance(t, 보유 비중)가 참인 날 종가에 목표 비중으로 되돌립니다."""
+    values = returns.fillna(0).to_numpy()
+    weights = np.asarray(weights, dtype=float) / np.sum(weights)
+    holdings = weights.copy()
+    path = []
+    for t, row in enumerate(values):
+        holdings = holdings * (1 + row)
+        value = holdings.sum()
+        path.append(value)
+        if t < len(values) - 1 and rebalance(t, holdings / value):
+            value *= 1 - cost * np.abs(weights - holdings / value).sum()
+            holdings = weights * value
+    return np.array(path)
+
+
+@check("backtest")
+def check_backtest():
+    from backtest import backtest
+    returns = _returns(gaps=False)
+    weights = np.linspace(1, 2, returns.shape[1])
+    target = weights / weights.sum()
+    months = returns.index.to_period("M")
+
+    result = backtest(returns, weights, frequency="monthly", cost=0.001)
+    expected = _naive_backtest(returns, weights, 0.001, lambda t, held: months[t] != months[t + 1])
+    np.testing.assert_allclose(result['Value'].to_numpy(), expected, rtol=TOLERANCE)
+
+    result = backtest(returns, weights, threshold=0.02, cost=0.002)
+    expected = _naive_backtest(returns, weights, 0.002, lambda t, held: np.abs(held - target).max() > 0.02)
+    np.testing.assert_allclose(result['Value'].to_numpy(), expected, rtol=TOLERANCE)
+
+    result = backtest(returns, weights)
+    expected = _naive_backtest(returns, weights, 0.0, lambda t, held: False)
+    np.testing.assert_allclose(result['Value'].to_numpy(), expected, rtol=TOLERANCE)
+
+
+@check("risk_simulation")
+def check_risk_simulation():
+    from risk_simulation import _bootstrap_chunk, value_at_risk
+    returns = _returns(gaps=False)
+    weights = np.full(returns.shape[1], 1 / returns.shape[1])
+    log_returns = np.log1p(returns.to_numpy())
+    horizons, block = (1, 7, 12), 5
+    cumulative = np.vstack([np.zeros(log_returns.shape[1]), np.cumsum(log_returns, axis=0)])
+
+    # 부트스트랩: 같은 난수로 뽑은 블록들을 실제로 이어 붙인 경로와 비교합니다.
+    scenarios = _bootstrap_chunk((cumulative, weights, horizons, block), np.random.default_rng(1), 50)
+    starts = np.random.default_rng(1).integers(0, len(log_returns) - block + 1, size=(50, -(-max(horizons) // block)))
+    for i in range(50):
+        path = np.concatenate([log_returns[s:s + block] for s in starts[i]])
+        expected = [np.expm1(path[:h].sum(axis=0)) @ weights for h in horizons]
+        np.testing.assert_allclose(scenarios[i], expected, atol=TOLERANCE)
+
+    # 과거 VaR/CVaR: 겹치는 h일 복리 수익률의 하위 분위수와 그 이하 평균입니다.
+    table = value_at_risk(returns, weights, horizons=(1, 10), levels=(0.95,), methods=("Historical",))
+    portfolio = returns.to_numpy() @ weights
+    for horizon in (1, 10):
+        compounded = np.array([np.prod(1 + portfolio[t - horizon + 1:t + 1]) - 1
+                               for t in range(horizon - 1, len(portfolio))])
+        var = np.quantile(compounded, 0.05)
+        np.testing.assert_allclose(table.loc[("Historical", horizon), "VaR 95%"], var, atol=TOLERANCE)
+        np.testing.assert_allclose(table.loc[("Historical", horizon), "CVaR 95%"], compounded[compounded <= var].mean(),
+                                   atol=TOLERANCE)
+
+
+@check("walk_forward")
+def check_walk_forward():
+    from walk_forward import window_moments
+    returns = _returns(num_days=1500)
+    filled = returns.fillna(0)
+    positions, means, covs = window_moments(returns, "monthly", 12)
+    months = returns.index.to_period("M")
+    for position, mean, cov in zip(positions, means, covs):
+        # 학습 창은 position이 속한 달까지의 마지막 12개월입니다.
+        window = filled[(months <= months[position]) & (months > months[position] - 12)]
+        np.testing.assert_allclose(mean, window.mean().to_numpy(), atol=TOLERANCE)
+        np.testing.assert_allclose(cov, window.cov().to_numpy(), atol=TOLERANCE)
+
+
+@check("covariance")
+def check_covariance():
+    from covariance import CovarianceEstimator
+    returns = _returns()
+    filled = returns.fillna(0)
+    try:
+        from sklearn.covariance import ledoit_wolf
+    except ImportError:
+        ledoit_wolf = None
+        print("  scikit-learn이 없어 Ledoit-Wolf 비교는 건너뜁니다.")
+
+    for window in (None, 250):
+        # 한 번에, 하루씩, 불규칙한 묶음으로 갱신해도 같은 결과가 나와야 합니다.
+        for bounds in ([0, len(returns)], range(len(returns) + 1), [0, 1, 7, 300, 301, 650, len(returns)]):
+            estimator = CovarianceEstimator(returns.columns, window)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                estimator.update(returns.iloc[start:end])
+            expected = filled.iloc[-window:] if window else filled
+            np.testing.assert_allclose(estimator.covariance("sample").to_numpy(), expected.cov().to_numpy(),
+                                       rtol=1e-8, atol=1e-16)
+            if ledoit_wolf is not None:
+                shrunk, shrinkage = ledoit_wolf(expected.to_numpy())
+                np.testing.assert_allclose(estimator.covariance("ledoit_wolf").to_numpy(), shrunk, rtol=1e-8, atol=1e-16)
+                np.testing.assert_allclose(estimator.shrinkage(), shrinkage, rtol=1e-8)
+
+    estimator = CovarianceEstimator(returns.columns, decay=0.94).update(returns)
+    values = filled.to_numpy()
+    decays = 0.94 ** np.arange(len(values) - 1, -1, -1)
+    expected = (values * decays[:, None]).T @ values / decays.sum()
+    np.testing.assert_allclose(estimator.covariance("ewma").to_numpy(), expected, rtol=1e-8, atol=1e-16)
+
+
+@check("correlation")
+def check_correlation():
+    from correlation import MIN_PERIODS, correlate, correlation_matrix
+    returns = _returns(num_assets=30)
+    expected = returns.corr(min_periods=MIN_PERIODS)
+    np.testing.assert_allclose(correlation_matrix(returns).to_numpy(), expected.to_numpy(), atol=TOLERANCE)
+    one_vs_many = correlate(returns.iloc[:, :3], returns.iloc[:, 3:], block_size=7)
+    np.testing.assert_allclose(one_vs_many.to_numpy(), expected.iloc[3:, :3].to_numpy(), atol=TOLERANCE)
+    # 겹치는 날짜가 MIN_PERIODS보다 적은 쌍은 NaN입니다.
+    short = returns.iloc[:, :2].copy()
+    short.iloc[MIN_PERIODS // 2:, 1] = np.nan
+    assert np.isnan(correlate(short.iloc[:, 0], short.iloc[:, 1:]).iloc[0, 0])
+
+
+@check("providers")
+def check_providers():
+    from unittest import mock
+    import yfinance
+    from providers import YFinanceProvider
+    from scheduler import RequestScheduler
+    start, end = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-03-01")
+    empty = {"DEAD"}
+
+    def history(ticker, start=None, end=None, **kwargs):
+        # Ticker.history만 흉내 내고 yf.download의 나머지 경로는 그대로 거칩니다.
+        index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+        if ticker.ticker in empty:
+            index = index[:0]
+        return pd.DataFrame({column: 1.0 for column in ["Open", "High", "Low", "Close", "Adj Close", "Volume"]}, index=index)
+
+    provider = RequestScheduler(max_retries=1, base_delay=0, rate=1000)
+    with mock.patch.object(yfinance.Ticker, "history", history):
+        # 성공한 다운로드는 재시도 없이 그대로 돌아와야 합니다.
+        for tickers in (["SPY"], ["SPY", "QQQ"], ["SPY", "DEAD"]):
+            result = provider.call(tuple(tickers), YFinanceProvider().download, tickers, start, end)
+            assert set(result) == set(tickers), result.keys()
+            assert len(result["SPY"]) == len(pd.bdate_range(start, end - pd.Timedelta(days=1))), len(result["SPY"])
+            assert result["SPY"]["Adj Close"].notna().all()
+        assert result["DEAD"].empty
+        assert provider.stats["retries"] == 0, dict(provider.stats)
+        # 모든 티커가 비어 있으면 제한이나 일시적 실패로 보고 다시 시도한 뒤 예외를 전달합니다.
+        try:
+            provider.call(("DEAD",), YFinanceProvider().download, ["DEAD"], start, end)
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("empty download was not reported as a failure")
+        assert provider.stats["retries"] == 1, dict(provider.stats)
+        # 오늘 이전 평일이 없는 구간(주말)의 빈 결과는 정상입니다.
+        weekend = YFinanceProvider().download(["DEAD"], pd.Timestamp("2024-01-06"), pd.Timestamp("2024-01-08"))
+        assert weekend["DEAD"].empty
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터화 엔진과 참조 구현의 수치 비교")
+    parser.add_argument("--only", nargs="+", choices=sorted(CHECKS), help="실행할 검증 이름")
+    args = parser.parse_args()
+    failed = []
+    for name in args.only or list(CHECKS):
+        try:
+            CHECKS[name]()
+        except AssertionError as e:
+            failed.append(name)
+            print(f"FAIL {name}: {e}")
+        else:
+            print(f"ok   {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
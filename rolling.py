@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from metrics import RISK_FREE_RATE, TRADING_DAYS
+from factor_model import INTERCEPT, solve_factor_model
+
+ROLLING_WINDOWS = (63, 126, 252)
+ROW_CHUNK = 1024
+
+ROLLING_COLUMNS = ["Volatility", "Sharpe Ratio", "Beta", "Correlation"]
+
+
+class WindowSums:
+    """고정 길이 창 안의 합계를 유지합니다.
+
+    새 행의 기여분을 더하고 창을 벗어나는 행의 기여분을 빼는 방식이라 행 하나당 O(1)로 갱신되며,
+    창 안의 마지막 window개 행은 링 버퍼에 보관합니다. 기여분은 (행 x ...) 모양의 배열이면 됩니다.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.sums = None
+        self._buffer = None
+
+    def push(self, contributions):
+        """새 행들의 기여분을 더하고, 각 새 행 시점의 창 합계를 (행 x ...) 배열로 반환합니다."""
+        contributions = np.asarray(contributions, dtype=float)
+        n = len(contributions)
+        if self._buffer is None:
+            self._buffer = np.zeros((self.window,) + contributions.shape[1:])
+            self.sums = np.zeros(contributions.shape[1:])
+
+        # 새 행 i가 들어올 때 창을 벗어나는 행의 전체 순번은 count + i - window입니다.
+        exiting = self.count + np.arange(n) - self.window
+        from_new = exiting >= self.count
+        from_buffer = (exiting >= 0) & ~from_new
+        leaving = np.zeros_like(contributions)
+        leaving[from_new] = contributions[exiting[from_new] - self.count]
+        leaving[from_buffer] = self._buffer[exiting[from_buffer] % self.window]
+
+        sums = self.sums + np.cumsum(contributions - leaving, axis=0)
+        if n:
+            self.sums = sums[-1]
+
+        kept = contributions[-self.window:]
+        self._buffer[(self.count + n - len(kept) + np.arange(len(kept))) % self.window] = kept
+        self.count += n
+        return sums
+
+
+def _new_rows(frame, last_date):
+    return frame if last_date is None else frame[frame.index > last_date]
+
+
+class RollingMetrics:
+    """여러 티커의 롤링 변동성, 샤프 비율과 벤치마크 대비 베타, 상관계수를 증분 계산합니다.
+
+    update()는 이미 처리한 날짜를 건너뛰고 새로 들어온 날짜만 계산해 누적합니다. NaN은 그 날 관측치가 없는 것으로 보고,
+    창 안의 관측치가 min_periods(기본값은 창 길이의 절반)보다 적으면 NaN을 돌려줍니다.
+    """
+
+    def __init__(self, columns, window, risk_free_rate=RISK_FREE_RATE, min_periods=None):
+        self.columns = pd.Index(columns)
+        self.window = window
+        self.min_periods = min_periods or max(2, window // 2)
+        self.daily_risk_free = risk_free_rate / TRADING_DAYS
+        self.last_date = None
+        self.result = pd.DataFrame(columns=pd.MultiIndex.from_product([ROLLING_COLUMNS, self.columns]), dtype=float)
+        self._sums = WindowSums(window)
+
+    def update(self, returns, benchmark_returns=None):
+        """새 날짜의 수익률(열=티커)과 벤치마크 수익률을 받아 그 날짜들의 지표를 (지표, 티커) 열 DataFrame으로 반환합니다."""
+        returns = _new_rows(returns.reindex(columns=self.columns), self.last_date)
+        if returns.empty:
+            return self.result.iloc[:0]
+        if benchmark_returns is None:
+            benchmark = np.full(len(returns), np.nan)
+        else:
+            benchmark = benchmark_returns.reindex(returns.index).to_numpy(dtype=float)
+
+        values = returns.to_numpy(dtype=float)
+        chunks = [
+            self._compute(values[start:start + ROW_CHUNK], benchmark[start:start + ROW_CHUNK])
+            for start in range(0, len(values), ROW_CHUNK)
+        ]
+        frame = pd.DataFrame(np.concatenate(chunks), index=returns.index, columns=self.result.columns)
+        self.result = pd.concat([self.result, frame]) if len(self.result) else frame
+        self.last_date = returns.index[-1]
+        return frame
+
+    def _compute(self, x, y):
+        valid = ~np.isnan(x)
+        pair = valid & ~np.isnan(y)[:, None]
+        x0 = np.where(valid, x, 0)
+        xp = np.where(pair, x, 0)
+        yp = np.where(pair, y[:, None], 0)
+        n, sx, sxx, n_pair, sxp, syp, sxxp, syyp, sxyp = np.moveaxis(
+            self._sums.push(np.stack([valid, x0, x0 ** 2, pair, xp, yp, xp ** 2, yp ** 2, xp * yp], axis=1)), 1, 0
+        )
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sx / n
+            std = np.sqrt(np.maximum(sxx - sx * mean, 0) / (n - 1))
+            covariance = (sxyp - sxp * syp / n_pair) / (n_pair - 1)
+            var_x = np.maximum(sxxp - sxp ** 2 / n_pair, 0) / (n_pair - 1)
+            var_y = np.maximum(syyp - syp ** 2 / n_pair, 0) / (n_pair - 1)
+            metrics = [
+                np.where(n >= self.min_periods, std * np.sqrt(TRADING_DAYS), np.nan),
+                np.where(n >= self.min_periods, (mean - self.daily_risk_free) / std * np.sqrt(TRADING_DAYS), np.nan),
+                np.where(n_pair >= self.min_periods, covariance / var_y, np.nan),
+                np.where(n_pair >= self.min_periods, covariance / np.sqrt(var_x * var_y), np.nan),
+            ]
+        return np.concatenate(metrics, axis=1)
+
+
+class RollingFactorLoadings:
+    """여러 ETF의 롤링 팩터 회귀(절편, 노출도, t-통계량)를 증분 계산합니다.
+
+    창마다 n, X'X, X'y 등의 합계를 새 행은 더하고 빠지는 행은 빼서 갱신한 뒤 solve_factor_model로 모든 창과 ETF를
+    한 번에 풀기 때문에 창을 처음부터 다시 회귀하지 않습니다. 팩터와 모든 대상 ETF가 함께 관측된 날짜만 사용합니다.
+    """
+
+    def __init__(self, factors, targets, window, ridge=0.0, min_periods=None):
+        self.factors = pd.Index(factors)
+        self.targets = pd.Index(targets)
+        self.window = window
+        self.ridge = ridge
+        self.min_periods = min_periods or max(len(self.factors) + 2, window // 2)
+        self.last_date = None
+        columns = pd.MultiIndex.from_product([self.targets, [INTERCEPT] + list(self.factors)])
+        self.result = pd.DataFrame(columns=columns, dtype=float)
+        self.tstats = pd.DataFrame(columns=columns, dtype=float)
+        self._sums = {name: WindowSums(window) for name in ('n', 'sx', 'sy', 'sxx', 'sxy', 'syy')}
+
+    def update(self, target_returns, factor_returns):
+        """새 날짜의 대상 수익률(열=ETF)과 팩터 수익률(열=팩터)을 받아 그 날짜들의 계수를 (ETF, 항) 열 DataFrame으로 반환합니다."""
+        index = _new_rows(target_returns, self.last_date).index
+        if index.empty:
+            return self.result.iloc[:0]
+        y = target_returns.reindex(index=index, columns=self.targets).to_numpy(dtype=float)
+        x = factor_returns.reindex(index=index, columns=self.factors).to_numpy(dtype=float)
+
+        chunks = [self._compute(x[start:start + ROW_CHUNK], y[start:start + ROW_CHUNK])
+                  for start in range(0, len(index), ROW_CHUNK)]
+        frame = pd.DataFrame(np.concatenate([coef for coef, _ in chunks]), index=index, columns=self.result.columns)
+        tstats = pd.DataFrame(np.concatenate([tstat for _, tstat in chunks]), index=index, columns=self.result.columns)
+        self.result = pd.concat([self.result, frame]) if len(self.result) else frame
+        self.tstats = pd.concat([self.tstats, tstats]) if len(self.tstats) else tstats
+        self.last_date = index[-1]
+        return frame
+
+    def _compute(self, x, y):
+        complete = ~np.isnan(x).any(axis=1) & ~np.isnan(y).any(axis=1)
+        x = np.where(complete[:, None], x, 0)
+        y = np.where(complete[:, None], y, 0)
+        sums = {
+            'n': self._sums['n'].push(complete.astype(float)),
+            'sx': self._sums['sx'].push(x),
+            'sy': self._sums['sy'].push(y),
+            'sxx': self._sums['sxx'].push(x[:, :, None] * x[:, None, :]),
+            'sxy': self._sums['sxy'].push(x[:, :, None] * y[:, None, :]),
+            'syy': self._sums['syy'].push(y ** 2),
+        }
+
+        # 관측치가 충분한 창만 풀고 나머지는 NaN으로 둡니다.
+        enough = sums['n'] >= self.min_periods
+        coef = np.full((len(x), y.shape[1], len(self.factors) + 1), np.nan)
+        tstat = np.full_like(coef, np.nan)
+        if enough.any():
+            solved = solve_factor_model(**{name: value[enough] for name, value in sums.items()}, ridge=self.ridge)
+            coef[enough] = np.swapaxes(solved['coef'], 1, 2)
+            tstat[enough] = np.swapaxes(solved['tstat'], 1, 2)
+        return coef.reshape(len(x), -1), tstat.reshape(len(x), -1)
@@ -0,0 +1,105 @@
+import os
+import time
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+PROVIDER_MAX_WORKERS = int(os.getenv("PROVIDER_MAX_WORKERS", 8))
+PROVIDER_RATE = float(os.getenv("PROVIDER_RATE", 4))
+PROVIDER_BURST = int(os.getenv("PROVIDER_BURST", 8))
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", 4))
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 쌓이는 토큰 버킷입니다."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """토큰 하나를 얻을 때까지 기다리고, 기다린 시간(초)을 반환합니다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """데이터 제공자 요청을 한곳에서 실행하는 스케줄러입니다.
+
+    요청은 제한된 작업 스레드에서 실행되고, 시도마다 토큰 버킷으로 초당 요청 수를 제한합니다. 실패한 시도는 지터를 준
+    지수 백오프(full jitter) 후 max_retries번까지 다시 시도하며, 대기는 작업 스레드에서 일어나므로 호출한 스레드는
+    결과가 필요할 때만 기다립니다. 같은 키의 요청이 진행 중이면 새로 보내지 않고 그 Future를 함께 돌려줍니다.
+    """
+
+    def __init__(self, max_workers=PROVIDER_MAX_WORKERS, rate=PROVIDER_RATE, burst=PROVIDER_BURST,
+                 max_retries=PROVIDER_MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY, retry_on=(Exception,)):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.stats = Counter()
+        self._bucket = TokenBucket(rate, burst)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, **kwargs):
+        """func(*args, **kwargs)를 예약하고 Future를 반환합니다. key는 같은 요청을 합치는 데 쓰는 해시 가능한 값입니다."""
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            future = self._pool.submit(self._run, key, func, args, kwargs)
+            self._inflight[key] = future
+            return future
+
+    def call(self, key, func, *args, **kwargs):
+        """요청을 예약하고 결과를 기다려 반환합니다. 재시도가 모두 실패하면 마지막 예외를 그대로 전달합니다."""
+        return self.submit(key, func, *args, **kwargs).result()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _run(self, key, func, args, kwargs):
+        try:
+            for attempt in range(self.max_retries + 1):
+                waited = self._bucket.acquire()
+                with self._lock:
+                    self.stats["attempts"] += 1
+                    if waited:
+                        self.stats["throttled"] += 1
+                try:
+                    return func(*args, **kwargs)
+                except self.retry_on:
+                    if attempt == self.max_retries:
+                        with self._lock:
+                            self.stats["failures"] += 1
+                        raise
+                    with self._lock:
+                        self.stats["retries"] += 1
+                    time.sleep(self._backoff(attempt))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+# 프로세스 전체의 제공자 요청이 함께 쓰는 스케줄러입니다.
+scheduler = RequestScheduler()
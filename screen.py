@@ -0,0 +1,151 @@
+"""대규모 ETF 유니버스를 브라우저 없이 스크리닝하는 배치 진입점입니다.
+
+    python screen.py universe.txt --start 2019-01-01 --output screen.parquet --workers 8
+
+유니버스 파일은 한 줄에 티커 하나인 텍스트 파일이거나 'ETF' 또는 'Ticker' 컬럼이 있는 CSV 파일입니다.
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from price_store import get_prices, get_prices_batch
+from metrics import metrics_frame
+from factor_model import FACTOR_TICKERS, INTERCEPT, fit_factor_model
+
+PREFETCH_CHUNK = 200
+BLOCK_SIZE = 256
+
+_benchmark_returns = None
+_factor_returns = None
+_ridge = 0.0
+_start_date = None
+_end_date = None
+
+
+def load_universe(path):
+    """유니버스 파일에서 중복 없는 티커 목록을 읽어옵니다."""
+    if path.endswith(".csv"):
+        universe = pd.read_csv(path)
+        column = next((c for c in universe.columns if c.lower() in ("etf", "ticker", "symbol")), universe.columns[0])
+        tickers = universe[column].dropna().astype(str)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            tickers = [line.split("#")[0] for line in f]
+    tickers = [ticker.strip().upper() for ticker in tickers]
+    return list(dict.fromkeys(ticker for ticker in tickers if ticker))
+
+
+def _init_worker(benchmark_returns, start_date, end_date, factor_returns=None, ridge=0.0):
+    global _benchmark_returns, _factor_returns, _ridge, _start_date, _end_date
+    _benchmark_returns = benchmark_returns
+    _factor_returns = factor_returns
+    _ridge = ridge
+    _start_date = start_date
+    _end_date = end_date
+
+
+def _screen_block(tickers):
+    """저장소의 가격으로 티커 묶음의 지표를 한 번의 벡터 연산으로 계산합니다.
+
+    fork된 작업 프로세스에서는 부모가 쓰던 요청 스케줄러의 스레드 풀이 동작하지 않으므로 내려받지 않고 저장소만 읽습니다.
+    미리 받아 두지 못한 티커(상장 폐지, 잘못된 티커 등)는 'no data'로 남습니다.
+    """
+    returns = {}
+    errors = {}
+    for ticker in tickers:
+        try:
+            data = get_prices(ticker, _start_date, _end_date, fetch=False)
+            if data.empty:
+                errors[ticker] = "no data"
+            else:
+                returns[ticker] = data["Adj Close"].pct_change().dropna()
+        except Exception as e:
+            errors[ticker] = str(e)
+
+    rows = pd.DataFrame(index=pd.Index(tickers, name="Ticker"))
+    rows["Observations"] = 0
+    if returns:
+        returns = pd.concat(returns, axis=1)
+        rows.loc[returns.columns, "Observations"] = returns.notna().sum().to_numpy()
+        rows = rows.join(metrics_frame(returns, _benchmark_returns))
+        if _factor_returns is not None:
+            # 묶음 안의 모든 티커를 하나의 다중 대상 최소제곱으로 팩터에 회귀합니다.
+            model = fit_factor_model(returns, _factor_returns, _ridge)
+            exposures = model["Coefficient"].drop(columns=INTERCEPT).add_suffix(" Exposure")
+            rows = rows.join(exposures).join(model["R2"].rename("Factor R2"))
+    rows["Error"] = pd.Series(errors, dtype=object)
+    return rows
+
+
+def _load_factor_returns(start_date, end_date):
+    """팩터 티커의 일간 수익률을 팩터 이름을 열로 하는 DataFrame으로 읽어옵니다."""
+    prices = get_prices_batch(list(FACTOR_TICKERS.values()), start_date, end_date)
+    factor_returns = {
+        factor: prices[ticker]["Adj Close"].pct_change().dropna()
+        for factor, ticker in FACTOR_TICKERS.items()
+        if ticker in prices and not prices[ticker].empty
+    }
+    if not factor_returns:
+        raise ValueError("팩터 데이터를 찾을 수 없습니다.")
+    return pd.concat(factor_returns, axis=1)
+
+
+def run_screen(tickers, start_date, end_date, benchmark="^GSPC", workers=None, block_size=BLOCK_SIZE,
+               factors=False, ridge=0.0):
+    """티커 목록의 성과 및 리스크 지표를 프로세스 풀에서 병렬로 계산해 DataFrame으로 반환합니다.
+
+    factors=True이면 팩터 노출도와 결정계수 열을 함께 계산하며, ridge는 팩터 회귀의 리지 벌점입니다.
+    """
+    # 가격은 먼저 그룹 요청으로 저장소에 채워 두고, 작업 프로세스는 디스크에서만 읽습니다.
+    for i in range(0, len(tickers), PREFETCH_CHUNK):
+        get_prices_batch(tickers[i:i + PREFETCH_CHUNK], start_date, end_date)
+
+    benchmark_data = get_prices(benchmark, start_date, end_date)
+    if benchmark_data.empty:
+        raise ValueError(f"{benchmark} 벤치마크 데이터를 찾을 수 없습니다.")
+    benchmark_returns = benchmark_data["Adj Close"].pct_change().dropna()
+    factor_returns = _load_factor_returns(start_date, end_date) if factors else None
+
+    workers = workers or os.cpu_count()
+    # 작업 프로세스마다 여러 블록이 돌아가도록 블록 크기를 조정합니다.
+    block_size = max(1, min(block_size, -(-len(tickers) // (workers * 2))))
+    blocks = [tickers[i:i + block_size] for i in range(0, len(tickers), block_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(benchmark_returns, start_date, end_date, factor_returns, ridge)) as pool:
+        results = list(pool.map(_screen_block, blocks))
+    return pd.concat(results)
+
+
+def write_results(results, path):
+    """확장자에 따라 결과 표를 Parquet 또는 CSV로 저장합니다."""
+    if path.endswith(".parquet"):
+        results.to_parquet(path)
+    else:
+        results.to_csv(path)
+
+
+def main():
+    today = pd.Timestamp.today().normalize()
+    parser = argparse.ArgumentParser(description="ETF 유니버스 배치 스크리닝")
+    parser.add_argument("universe", help="티커 목록 파일 (.txt 또는 .csv)")
+    parser.add_argument("--start", default=str((today - pd.DateOffset(years=5)).date()), help="시작 날짜 (기본: 5년 전)")
+    parser.add_argument("--end", default=str(today.date()), help="종료 날짜 (기본: 오늘)")
+    parser.add_argument("--benchmark", default="^GSPC", help="벤치마크 티커")
+    parser.add_argument("--output", default="screen_results.parquet", help="결과 파일 (.parquet 또는 .csv)")
+    parser.add_argument("--workers", type=int, default=None, help="작업 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--factors", action="store_true", help="팩터 노출도와 결정계수도 계산")
+    parser.add_argument("--ridge", type=float, default=0.0, help="팩터 회귀의 리지 벌점 (팩터 평균 분산 대비)")
+    args = parser.parse_args()
+
+    tickers = load_universe(args.universe)
+    started = time.perf_counter()
+    results = run_screen(tickers, args.start, args.end, args.benchmark, args.workers,
+                         factors=args.factors, ridge=args.ridge)
+    write_results(results, args.output)
+    failed = results["Error"].notna().sum()
+    print(f"{len(results)}개 티커 스크리닝 완료 ({failed}개 실패), {time.perf_counter() - started:.1f}초 -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+import threading
+from concurrent.futures import wait
+from disk_cache import DiskCache
+from providers import get_provider, request
+
+INFO_CACHE_TTL = 24 * 60 * 60
+
+# 디스크 캐시 위에 프로세스 메모리 사본을 두어, Streamlit 재실행마다 파일을 다시 읽지 않습니다.
+# 캐시는 데이터 제공자별로 나뉘므로 합성 데이터나 스냅숏의 정보가 실제 정보와 섞이지 않습니다.
+_info_caches = {}
+_memory = {}
+_lock = threading.Lock()
+
+
+def _cache(provider_name):
+    with _lock:
+        if provider_name not in _info_caches:
+            name = "ticker_info" if provider_name == "yfinance" else f"ticker_info_{provider_name}"
+            _info_caches[provider_name] = DiskCache(name, ttl=INFO_CACHE_TTL)
+        return _info_caches[provider_name]
+
+
+def _entry(ticker):
+    """(정보, 저장 시각) 항목을 메모리, 디스크 순으로 찾습니다. 없으면 None입니다."""
+    provider_name = get_provider().name
+    with _lock:
+        entry = _memory.get((provider_name, ticker))
+    if entry is None:
+        entry = _cache(provider_name).get_entry(ticker)
+        if entry is not None:
+            with _lock:
+                _memory[(provider_name, ticker)] = entry
+    return entry
+
+
+def _fetch(ticker):
+    provider = get_provider()
+    info = provider.info(ticker)
+    _cache(provider.name).set(ticker, info)
+    with _lock:
+        _memory[(provider.name, ticker)] = (info, time.time())
+    return info
+
+
+def _fetch_async(ticker):
+    """티커의 정보 요청을 제공자에 보냅니다. 같은 티커의 요청이 이미 진행 중이면 그 요청을 함께 기다립니다."""
+    return request(("info", ticker), _fetch, ticker)
+
+
+def _is_fresh(entry):
+    return _cache(get_provider().name).is_fresh(entry)
+
+
+def get_info(ticker, stale_while_revalidate=True):
+    """현재 데이터 제공자의 종목 정보(yf.Ticker(ticker).info 형식)를 TTL 캐시를 거쳐 반환합니다.
+
+    stale_while_revalidate가 참이면 만료된 항목은 그대로 돌려주고 백그라운드에서 새로 받아 둡니다.
+    캐시에 없으면 요청 결과를 기다리며, 요청이 실패하면 예외가 그대로 전달됩니다.
+    """
+    entry = _entry(ticker)
+    if _is_fresh(entry):
+        return entry[0]
+    if entry is not None and stale_while_revalidate:
+        _fetch_async(ticker)
+        return entry[0]
+    return _fetch_async(ticker).result()
+
+
+def prefetch_info(tickers, stale_while_revalidate=True):
+    """여러 티커의 정보를 동시에 받아 {티커: 정보} 딕셔너리로 반환합니다. 요청이 실패한 티커는 빠집니다."""
+    tickers = list(dict.fromkeys(tickers))
+    infos = {}
+    futures = {}
+    for ticker in tickers:
+        entry = _entry(ticker)
+        if _is_fresh(entry):
+            infos[ticker] = entry[0]
+        elif entry is not None and stale_while_revalidate:
+            _fetch_async(ticker)
+            infos[ticker] = entry[0]
+        else:
+            futures[ticker] = _fetch_async(ticker)
+
+    wait(futures.values())
+    for ticker, future in futures.items():
+        if future.exception() is None:
+            infos[ticker] = future.result()
+        else:
+            print(f"Error fetching info for {ticker}: {future.exception()}")
+    return {ticker: infos[ticker] for ticker in tickers if ticker in infos}
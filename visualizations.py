@@ -2,25 +2,101 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+from downsample import downsample, MAX_CHART_POINTS
 
-def plot_price_performance(data, ticker):
-    """ETF의 가격 성과를 시각화합니다."""
+# 그림 전체의 점 수가 이 값을 넘으면 SVG 대신 WebGL 트레이스로 그립니다.
+WEBGL_THRESHOLD = 5000
+# 산점도로 브라우저에 보내는 최대 점 수입니다.
+MAX_SCATTER_POINTS = 100000
+FIGURE_CACHE_SIZE = 32
+
+def _use_webgl(num_points):
+    return num_points > WEBGL_THRESHOLD
+
+def _scatter(x, y, webgl=False, **kwargs):
+    """선/산점도 트레이스를 만듭니다. 값은 NumPy 배열로 넘겨 Plotly가 base64 이진 배열로 직렬화하게 합니다."""
+    trace = go.Scattergl if webgl else go.Scatter
+    x = x.to_numpy() if isinstance(x, pd.Index) else np.asarray(x)
+    return trace(x=x, y=np.asarray(y, dtype=float), **kwargs)
+
+def _show(fig):
+    """그림을 출력합니다. WebGL 트레이스가 있으면 SVG 렌더러를 쓰지 않습니다."""
+    if any(trace.type == 'scattergl' for trace in fig.data):
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.plotly_chart(fig, use_container_width=True, renderer="svg")
+
+# 아래 _build_* 함수는 입력의 해시를 키로 만든 그림을 재사용하므로, Streamlit 재실행 때 같은 그림을 다시 만들지 않습니다.
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def _build_line_figure(frame, title, xaxis_title, yaxis_title):
+    webgl = _use_webgl(frame.size)
+    fig = go.Figure()
+    for column in frame.columns:
+        fig.add_trace(_scatter(frame.index, frame[column], webgl, mode='lines', name=str(column)))
+    fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title=yaxis_title)
+    return fig
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def _build_heatmap_figure(matrix, title):
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.to_numpy(dtype=float),
+        x=matrix.columns,
+        y=matrix.index,
+        colorscale='RdBu_r',
+        # 상관계수 범위로 고정해 시계열 선택이 바뀌어도 색이 같은 값을 뜻하게 합니다.
+        zmin=-1,
+        zmax=1
+    ))
+    fig.update_layout(title=title)
+    return fig
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def _build_frontier_figure(results, optimal_volatility, optimal_return):
+    # 무작위 표본은 순서와 무관하므로 일정 간격으로 솎아도 분포가 유지됩니다.
+    step = max(1, -(-results.shape[1] // MAX_SCATTER_POINTS))
+    points = results[:, ::step]
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Adj Close'], mode='lines', name=ticker))
-    fig.update_layout(title=f"{ticker} 가격 성과", xaxis_title="날짜", yaxis_title="가격")
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    fig.add_trace(_scatter(
+        points[0, :],
+        points[1, :],
+        _use_webgl(points.shape[1]),
+        mode='markers',
+        marker=dict(
+            size=5,
+            color=points[2, :],
+            colorscale='Viridis',
+            showscale=True
+        ),
+        name='포트폴리오'
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=[optimal_volatility],
+        y=[optimal_return],
+        mode='markers',
+        marker=dict(size=15, color='red', symbol='star'),
+        name='최적 포트폴리오'
+    ))
+    
+    fig.update_layout(title='효율적 프론티어', xaxis_title='변동성', yaxis_title='수익률')
+    return fig
+
+def plot_price_performance(data, ticker, max_points=MAX_CHART_POINTS):
+    """ETF의 가격 성과를 시각화합니다. 분봉처럼 긴 시계열은 구간별 최저·최고가를 보존하며 max_points개로 줄여 보냅니다."""
+    prices = downsample(data['Adj Close'], max_points)
+    _show(_build_line_figure(prices.to_frame(ticker), f"{ticker} 가격 성과", "날짜", "가격"))
 
 def plot_risk_metrics(risk_metrics, ticker, benchmark_ticker):
     """리스크 메트릭스를 바 차트로 시각화합니다."""
     fig = go.Figure(data=[go.Bar(x=list(risk_metrics.keys()), y=list(risk_metrics.values()))])
     fig.update_layout(title=f"{ticker} vs {benchmark_ticker} 리스크 메트릭스", xaxis_title="메트릭", yaxis_title="값")
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(fig)
 
 def plot_factor_exposure(factor_exposure):
     """팩터 노출도를 바 차트로 시각화합니다."""
     fig = go.Figure(data=[go.Bar(x=factor_exposure.index, y=factor_exposure.values)])
     fig.update_layout(title='팩터 노출도', xaxis_title='팩터', yaxis_title='노출도')
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(fig)
 
 def plot_etf_comparison(comparison_data):
     """ETF 비교 데이터를 바 차트로 시각화합니다."""
@@ -28,25 +104,24 @@ def plot_etf_comparison(comparison_data):
     for column in ['Annual Return', 'Sharpe Ratio', 'Max Drawdown']:
         fig.add_trace(go.Bar(x=comparison_data['ETF'], y=comparison_data[column], name=column))
     fig.update_layout(barmode='group', title="ETF 성과 비교")
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(fig)
 
 def plot_macro_correlation(correlation_data, ticker):
     """매크로 상관관계를 히트맵으로 시각화합니다."""
-    fig = go.Figure(data=go.Heatmap(
-        z=correlation_data.values,
-        x=correlation_data.columns,
-        y=correlation_data.index,
-        colorscale='RdBu_r'
-    ))
-    fig.update_layout(title=f'{ticker}와 매크로 지표 간 상관관계')
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(_build_heatmap_figure(correlation_data, f'{ticker}와 매크로 지표 간 상관관계'))
+
+def plot_rolling_metrics(rolling_data, title):
+    """롤링 지표를 열마다 하나의 선으로 시각화합니다."""
+    _show(_build_line_figure(rolling_data, title, "날짜", "값"))
+
+def plot_backtest(values):
+    """리밸런싱 규칙별 포트폴리오 가치(시작 1)를 시각화합니다."""
+    _show(_build_line_figure(values, "리밸런싱 규칙별 포트폴리오 가치", "날짜", "가치"))
 
 def plot_portfolio_summary(portfolio_data, performance_metrics):
     """포트폴리오 개요를 시각화합니다."""
     cumulative_returns = performance_metrics['Cumulative Returns']
-    fig = go.Figure(data=go.Scatter(x=cumulative_returns.index, y=cumulative_returns.values, mode='lines'))
-    fig.update_layout(title='누적 수익률', xaxis_title="날짜", yaxis_title="누적 수익률")
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(_build_line_figure(cumulative_returns.to_frame('Portfolio'), '누적 수익률', "날짜", "누적 수익률"))
     
     st.write("포트폴리오 성과 지표:")
     st.write(f"연간 수익률: {performance_metrics['Annual Return']*100:.2f}%")
@@ -57,47 +132,17 @@ def plot_cumulative_returns(portfolio_data):
     """포트폴리오의 누적 수익률을 시각화합니다."""
     returns = pd.DataFrame({etf: data['returns'] for etf, data in portfolio_data.items()})
     cumulative_returns = (1 + returns).cumprod()
-    
-    fig = go.Figure()
-    for column in cumulative_returns.columns:
-        fig.add_trace(go.Scatter(x=cumulative_returns.index, y=cumulative_returns[column], mode='lines', name=column))
-    fig.update_layout(title='누적 수익률', xaxis_title="날짜", yaxis_title="누적 수익률")
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(_build_line_figure(cumulative_returns, '누적 수익률', "날짜", "누적 수익률"))
 
 def plot_asset_allocation(asset_allocation):
     """자산 배분을 파이 차트로 시각화합니다."""
     fig = go.Figure(data=[go.Pie(labels=list(asset_allocation.keys()), values=list(asset_allocation.values()))])
     fig.update_layout(title='자산 배분')
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(fig)
 
 def plot_efficient_frontier(results, optimal_portfolio):
     """효율적 프론티어와 최적 포트폴리오를 시각화합니다."""
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=results[0,:],
-        y=results[1,:],
-        mode='markers',
-        marker=dict(
-            size=5,
-            color=results[2,:],
-            colorscale='Viridis',
-            showscale=True
-        ),
-        name='포트폴리오'
-    ))
-    
-    optimal_return = optimal_portfolio.fun * -1
-    optimal_volatility = results[0, np.argmax(results[2])]
-    fig.add_trace(go.Scatter(
-        x=[optimal_volatility],
-        y=[optimal_return],
-        mode='markers',
-        marker=dict(size=15, color='red', symbol='star'),
-        name='최적 포트폴리오'
-    ))
-    
-    fig.update_layout(title='효율적 프론티어', xaxis_title='변동성', yaxis_title='수익률')
-    st.plotly_chart(fig, use_container_width=True, renderer="svg")
+    _show(_build_frontier_figure(results, optimal_portfolio.annual_volatility, optimal_portfolio.annual_return))
 
 def display_performance_metrics(performance_metrics):
     """성과 지표를 표시합니다."""